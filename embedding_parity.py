@@ -0,0 +1,94 @@
+import json
+import sys
+import argparse
+import traceback
+from dataclasses import asdict
+from pathlib import Path
+from typing import List
+from rag.bootstrap.bootstrap import container
+from rag.commands.embedding_parity_command import EmbeddingParityCommand
+from rag.utils.logger import logger
+
+DEFAULT_INPUT = "datasets/questions.json"
+
+class ValidationError(Exception):
+    pass
+
+class FileNotFound(ValidationError):
+    def __init__(self, path: Path):
+        super().__init__(f"File not found: {path}")
+
+def load_texts(file_path: Path, limit: int) -> List[str]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        texts = [json.loads(line)["question"] for line in f.readlines()]
+    return texts[:limit]
+
+def validate_args(args: argparse.Namespace) -> None:
+    questions_path = Path(args.input_file)
+    if not questions_path.is_file():
+        raise FileNotFound(questions_path)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Embedding backend parity check')
+    parser.add_argument(
+        '--reference',
+        type=str,
+        default='embedding_driver',
+        help='Reference embedding container (default: embedding_driver)'
+    )
+    parser.add_argument(
+        '--candidate',
+        type=str,
+        default='embedding_onnx_driver',
+        help='Checked embedding container (default: embedding_onnx_driver)'
+    )
+    parser.add_argument(
+        '--input_file',
+        type=str,
+        default=DEFAULT_INPUT,
+        help='Path to the questions file'
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=500,
+        help='Maximum number of texts to compare (default: 500)'
+    )
+    parser.add_argument(
+        '--batch_size',
+        type=int,
+        default=64,
+        help='Number of texts embedded in one batch (default: 64)'
+    )
+    parser.add_argument(
+        '--max_drift',
+        type=float,
+        default=0.01,
+        help='Allowed 1 - cosine between backends for one text (default: 0.01)'
+    )
+
+    args = parser.parse_args()
+    validate_args(args)
+    return args
+
+def main() -> None:
+    try:
+        args = parse_args()
+
+        reference = getattr(container, args.reference)()
+        candidate = getattr(container, args.candidate)()
+        texts = load_texts(Path(args.input_file), args.limit)
+        logger().info(f"Loaded {len(texts)} texts")
+
+        command = EmbeddingParityCommand(batch_size=args.batch_size, max_drift=args.max_drift)
+        report = command.execute(reference, candidate, texts)
+        logger().info("Embedding parity check completed", **asdict(report))
+    except ValidationError as e:
+        logger().error(f"Validation error: {str(e)}")
+        sys.exit(1)
+    except Exception as e:
+        logger().error(f"Error: {str(e)}\n{traceback.format_exc()}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
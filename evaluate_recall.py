@@ -0,0 +1,88 @@
+import json
+import sys
+import argparse
+import traceback
+from dataclasses import asdict
+from pathlib import Path
+from typing import List, Dict
+from rag.bootstrap.bootstrap import container
+from rag.commands.evaluation_recall_command import EvaluationRecallCommand
+from rag.utils.logger import logger
+
+DEFAULT_INPUT = "datasets/questions.json"
+
+class ValidationError(Exception):
+    pass
+
+class FileNotFound(ValidationError):
+    def __init__(self, path: Path):
+        super().__init__(f"File not found: {path}")
+
+def load_questions(file_path: Path) -> List[Dict]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        questions = [json.loads(line) for line in f.readlines()]
+    return questions
+
+def validate_args(args: argparse.Namespace) -> None:
+    questions_path = Path(args.input_file)
+    if not questions_path.is_file():
+        raise FileNotFound(questions_path)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Recall of a reduced-dimension vector database')
+    parser.add_argument(
+        '--database',
+        type=str,
+        required=True,
+        help='Evaluated database from faiss_factory.yaml items, e.g. 512_pca256'
+    )
+    parser.add_argument(
+        '--reference',
+        type=str,
+        required=True,
+        help='Full-dimension database from faiss_factory.yaml items, e.g. 512'
+    )
+    parser.add_argument(
+        '--input_file',
+        type=str,
+        default=DEFAULT_INPUT,
+        help='Path to the questions file'
+    )
+    parser.add_argument(
+        '--max_results',
+        type=int,
+        default=5,
+        help='Number of documents compared per question (default: 5)'
+    )
+    parser.add_argument(
+        '--batch_size',
+        type=int,
+        default=64,
+        help='Number of questions searched in one batch (default: 64)'
+    )
+
+    args = parser.parse_args()
+    validate_args(args)
+    return args
+
+def main() -> None:
+    try:
+        args = parse_args()
+
+        db = getattr(container, f"faiss_db_driver__{args.database}")()
+        reference = getattr(container, f"faiss_db_driver__{args.reference}")()
+        questions = load_questions(Path(args.input_file))
+        logger().info(f"Loaded {len(questions)} questions")
+
+        command = EvaluationRecallCommand(max_results=args.max_results, batch_size=args.batch_size)
+        report = command.execute(args.database, db, args.reference, reference, questions)
+        logger().info("Recall evaluation completed", **asdict(report))
+    except ValidationError as e:
+        logger().error(f"Validation error: {str(e)}")
+        sys.exit(1)
+    except Exception as e:
+        logger().error(f"Error: {str(e)}\n{traceback.format_exc()}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
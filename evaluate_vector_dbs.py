@@ -2,6 +2,7 @@ import json
 import sys
 import argparse
 import traceback
+from dataclasses import asdict
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict
@@ -57,6 +58,18 @@ def parse_args() -> argparse.Namespace:
         default=5,
         help='Maximum number of documents to retrieve (default: 5)'
     )
+    parser.add_argument(
+        '--batch_size',
+        type=int,
+        default=64,
+        help='Number of questions searched in one batch (default: 64)'
+    )
+    parser.add_argument(
+        '--embedding_workers',
+        type=int,
+        default=None,
+        help='Number of embedding processes, each with its own model (default: in-process)'
+    )
 
     args = parser.parse_args()
     validate_args(args)
@@ -79,17 +92,21 @@ def main() -> None:
         output_dir.mkdir(exist_ok=True)
 
         embedding = container.embedding_driver()
+        if args.embedding_workers:
+            embedding.start_workers(args.embedding_workers)
         vector_eval = container.vector_evaluation_service()
         metrics_collector = MetricsCollection()
         quality_analyzer = QualityAnalyzer(metrics_collector=metrics_collector)
 
-        vector_db_service = VectorDatabaseService(embedding=embedding)
+        pool = container.faiss_db_pool()
+        vector_db_service = VectorDatabaseService(embedding=embedding, pool=pool)
         evaluation_command = EvaluationVectorDBCommand(
             quality_analyzer=quality_analyzer,
             embedding=embedding,
             vector_eval=vector_eval,
             metrics_collector=metrics_collector,
-            max_results=max_results
+            max_results=max_results,
+            batch_size=args.batch_size
         )
         results_service = ResultsService()
 
@@ -143,8 +160,12 @@ def main() -> None:
             "Vector database evaluation completed",
             start_time=start_time.strftime("%H:%M:%S"),
             end_time=end_time.strftime("%H:%M:%S"),
-            duration_seconds=duration
+            duration_seconds=duration,
+            **asdict(pool.get_stats())
         )
+        if embedding.query_cache is not None:
+            query_cache_stats = embedding.query_cache.get_stats()
+            logger().info("Query embedding cache", **asdict(query_cache_stats), hit_rate=query_cache_stats.hit_rate)
     except ValidationError as e:
         logger().error(f"Validation error: {str(e)}")
         sys.exit(1)
@@ -1,9 +1,15 @@
 import argparse
+from dataclasses import asdict
 from pathlib import Path
 from config_loader.config import ConfigFactory
 from config_loader.yaml_service import YamlReaderService
 
-from rag.utils.path import dataset_path, absolute_path
+from rag.entities.index import IndexSyncResult
+from rag.services.index_journal_service import IndexJournal
+from rag.utils.path import dataset_path, absolute_path, data_path
+
+INDEX_MODES: tuple[str, ...] = ('create', 'update')
+DEFAULT_BATCH_SIZE: int = 256
 
 class UndefinedIndexer(Exception):
     def __init__(self, indexer_type: str):
@@ -17,14 +23,21 @@ class UndefinedIndexerHandler(Exception):
     def __init__(self, index_type: str, index_handler_type: str):
         super().__init__(f"Undefined '{index_type}' handler: '{index_handler_type}'")
 
+class UndefinedIndexMode(Exception):
+    def __init__(self, mode: str):
+        super().__init__(f"Undefined index mode: '{mode}'")
+
 class DatasetFileNotFound(FileNotFoundError):
     def __init__(self, path: Path):
         super().__init__(f"Dataset file not found: '{path}'")
 
 def validate_args(args) -> None:
-    if args.indexer_type not in ['forward_indexer', 'splitter_indexer']:
+    if args.indexer_type not in ['forward_indexer', 'splitter_indexer', 'hierarchical_indexer']:
         raise UndefinedIndexer(args.index_type)
 
+    if args.mode not in INDEX_MODES:
+        raise UndefinedIndexMode(args.mode)
+
     configs = ConfigFactory.create(YamlReaderService.load(absolute_path('configuration.yaml')))
     if configs.get(f"container.{args.indexer_type}.kwargs_factory.{args.handler_type}") is None:
         raise UndefinedIndexerHandler(args.indexer_type, args.handler_type)
@@ -33,21 +46,67 @@ def validate_args(args) -> None:
     if not path.is_file():
         raise DatasetFileNotFound(path=path)
 
-parser = argparse.ArgumentParser()
+def main() -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--dataset_filename", type=str, required=True, help="Имя файла в дирректории dataset")
+    parser.add_argument("--indexer_type", type=str, required=True, help="Тип индексатора")
+    parser.add_argument("--handler_type", type=str, required=True, help="Тип обработчика")
+    parser.add_argument("--mode", type=str, default='create', help="Режим индексации: create - создание БД, update - инкрементальное обновление")
+    parser.add_argument("--batch_size", type=int, default=None, help="Размер батча эмбеддинга, включает потоковую индексацию")
+    parser.add_argument("--queue_depth", type=int, default=4, help="Максимальное число батчей в очереди между стадиями потоковой индексации")
+    parser.add_argument("--checkpoint_every", type=int, default=None, help="Сохранять БД каждые N проиндексированных документов")
+    parser.add_argument("--resume", action='store_true', help="Продолжить прерванную задачу с последнего чекпоинта")
+    parser.add_argument("--embedding_workers", type=int, default=None, help="Число процессов эмбеддинга, каждый со своей моделью на своих ядрах")
+
+    args = parser.parse_args()
+    validate_args(args)
+
+    # optimization init
+    from rag.bootstrap.bootstrap import container
+    indexer_name = f"{args.indexer_type}__{args.handler_type}"
+    indexer_provider = container.providers.get(indexer_name)
+    if indexer_provider is None:
+        raise IndexerNotFound(indexer=indexer_name)
+    container.log().info(f"Use indexer: {indexer_name}")
+    if args.embedding_workers:
+        container.embedding_driver().start_workers(args.embedding_workers)
 
-parser.add_argument("--dataset_filename", type=str, required=True, help="Имя файла в дирректории dataset")
-parser.add_argument("--indexer_type", type=str, required=True, help="Тип индексатора")
-parser.add_argument("--handler_type", type=str, required=True, help="Тип обработчика")
+    path = dataset_path(args.dataset_filename)
+    journal = IndexJournal.open(data_path(f"jobs/{indexer_name}_{path.stem}.json"), path, resume=args.resume)
+    # Прерванный индексатор продолжает работу поверх последнего чекпоинта
+    update = args.mode == 'update' or journal.is_started(indexer_name)
+    if journal.is_done(indexer_name):
+        journal.skip(indexer_name)
+        container.log().info('Indexer already finished, skipped', **journal.summary())
+    elif args.batch_size or args.checkpoint_every:
+        journal.start(indexer_name)
+        result = indexer_provider().stream_by_path(
+            path,
+            batch_size=args.batch_size or DEFAULT_BATCH_SIZE,
+            queue_depth=args.queue_depth,
+            update=update,
+            checkpoint_every=args.checkpoint_every,
+            on_checkpoint=lambda written: journal.checkpoint(indexer_name, written),
+        )
+        journal.finish(indexer_name, result)
+        container.log().info('success', **result.model_dump(), **journal.summary())
+    else:
+        journal.start(indexer_name)
+        indexer_instance = indexer_provider()
+        if update:
+            result = indexer_instance.update_by_path(path)
+        else:
+            documents = indexer_instance.file_loader.load(path)
+            indexer_instance.index(documents)
+            result = IndexSyncResult(added=len(documents.all()))
+        journal.finish(indexer_name, result)
+        container.log().info('success', **result.model_dump(), **journal.summary())
 
-args = parser.parse_args()
-validate_args(args)
+    # Индексаторы используют общий embedding_driver
+    embedding_stats = container.embedding_driver().get_stats()
+    container.log().info('embedding batches', **asdict(embedding_stats), padding_efficiency=embedding_stats.padding_efficiency)
 
-# optimization init
-from rag.bootstrap.bootstrap import container
-indexer_name = f"{args.indexer_type}__{args.handler_type}"
-indexer_provider = container.providers.get(indexer_name)
-if indexer_provider is None:
-    raise IndexerNotFound(indexer=indexer_name)
-container.log().info(f"Use indexer: {indexer_name}")
-indexer_provider().index_by_path(dataset_path(args.dataset_filename))
-container.log().info('success')
\ No newline at end of file
+# Процессы пула эмбеддинга импортируют этот модуль, индексация запускается только при прямом вызове
+if __name__ == "__main__":
+    main()
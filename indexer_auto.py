@@ -1,9 +1,13 @@
 import argparse
 from pathlib import Path
+from typing import Iterator
 import ijson
 from config_loader.utils import yaml_load_config
 from rag.entities.document import DocumentCollection, Document
-from rag.utils.path import dataset_path, config_path
+from rag.entities.index import IndexSyncResult
+from rag.modules.indexes.fan_out_indexer import FanOutIndexer, FanOutTarget
+from rag.services.index_journal_service import IndexJournal
+from rag.utils.path import dataset_path, config_path, data_path
 
 class IndexerNotFound(ValueError):
     def __init__(self, indexer_name: str):
@@ -13,16 +17,28 @@ class DatasetFileNotFound(FileNotFoundError):
     def __init__(self, path: Path):
         super().__init__(f"Dataset file not found: '{path}'")
 
+EXCLUDED_KEYS: set[str] = {"age", "city"}
+TEXT_FIELDS: dict[str, str] = {'text': 'text', 'html': 'text_html', 'md': 'text_markdown'}
+DEFAULT_BATCH_SIZE: int = 256
+
 def read_json_file(filepath: Path) -> dict:
     with open(filepath, 'r', encoding='utf-8') as file:
         for obj in ijson.items(file, 'item'):
             yield obj
     return {}
 
+def read_documents(filepath: Path, field: str) -> Iterator[Document]:
+    for item in read_json_file(filepath):
+        if field in item:
+            yield Document(text=item[field], metadata=prepare_metadata(item))
+
+def prepare_metadata(item: dict) -> dict:
+    return {key: value for key, value in item.items() if key not in EXCLUDED_KEYS}
+
 def get_indexer_type(indexer_name: str) -> str:
     return indexer_name.split('__')[-1]
 
-def indexer(container, indexer_name: str, documents: DocumentCollection) -> None:
+def indexer(container, indexer_name: str, documents: DocumentCollection, journal: IndexJournal, update: bool) -> None:
     if documents.empty():
         return
 
@@ -31,51 +47,168 @@ def indexer(container, indexer_name: str, documents: DocumentCollection) -> None
         if indexer_provider is None:
             raise IndexerNotFound(indexer_name)
         container.log().info(f"Use indexer: {indexer_name}")
-        indexer_provider().index(documents)
-        container.log().info('success')
+        journal.start(indexer_name)
+        if update:
+            result = indexer_provider().update(documents)
+        else:
+            indexer_provider().index(documents)
+            result = IndexSyncResult(added=len(documents.all()))
+        journal.finish(indexer_name, result)
+        container.log().info('success', **result.model_dump())
     except Exception as e:
         container.log().error(e)
 
-parser = argparse.ArgumentParser()
-
-parser.add_argument("--dataset_filename", type=str, required=True, help="Имя файла в дирректории dataset")
-args = parser.parse_args()
-path = dataset_path(args.dataset_filename)
-if not path.is_file():
-    raise DatasetFileNotFound(path)
-
-simple_text = DocumentCollection()
-markdown_text = DocumentCollection()
-html_text = DocumentCollection()
-
-excluded_keys = {"age", "city"}
-for item in read_json_file(path):
-    metadata = {key: value for key, value in item.items() if key not in excluded_keys}
-    if 'text' in item:
-        simple_text.push(Document(text=item['text'], metadata=metadata))
-    if 'text_html' in item:
-        html_text.push(Document(text=item['text_html'], metadata=metadata))
-    if 'text_markdown' in item:
-        markdown_text.push(Document(text=item['text_markdown'], metadata=metadata))
-
-indexer_configs = yaml_load_config(config_path('indexer_factory.yaml'))
-
-# optimization init
-from rag.bootstrap.bootstrap import container
-
-if simple_text.not_empty():
-    indexer(container, 'forward_indexer__documents', simple_text)
-if html_text.not_empty():
-    indexer(container, 'forward_indexer__documents__html', html_text)
-if markdown_text.not_empty():
-    indexer(container, 'forward_indexer__documents__md', markdown_text)
-
-for splitter_name, value in indexer_configs.get('splitter_indexer').items():
-    indexer_name = f"splitter_indexer__{splitter_name}"
-    type = get_indexer_type(str(splitter_name))
-    if type == 'html':
-        indexer(container, indexer_name, html_text)
-    elif type == 'md':
-        indexer(container, indexer_name, markdown_text)
+def stream_indexer(
+        container,
+        indexer_name: str,
+        documents: Iterator[Document],
+        journal: IndexJournal,
+        update: bool,
+        args: argparse.Namespace
+) -> None:
+    try:
+        indexer_provider = container.providers.get(indexer_name)
+        if indexer_provider is None:
+            raise IndexerNotFound(indexer_name)
+        container.log().info(f"Use indexer: {indexer_name}")
+        journal.start(indexer_name)
+        result = indexer_provider().stream(
+            documents,
+            batch_size=args.batch_size,
+            queue_depth=args.queue_depth,
+            update=update,
+            checkpoint_every=args.checkpoint_every,
+            on_checkpoint=lambda written: journal.checkpoint(indexer_name, written),
+        )
+        journal.finish(indexer_name, result)
+        container.log().info('success', **result.model_dump())
+    except Exception as e:
+        container.log().error(e)
+
+def fan_out_indexer(
+        container,
+        indexer_names: dict[str, str],
+        documents: dict[str, DocumentCollection],
+        journal: IndexJournal,
+        updates: dict[str, bool],
+        args: argparse.Namespace
+) -> None:
+    targets = []
+    for indexer_name, type in indexer_names.items():
+        indexer_provider = container.providers.get(indexer_name)
+        if indexer_provider is None:
+            container.log().error(IndexerNotFound(indexer_name))
+            continue
+        indexer_instance = indexer_provider()
+        targets.append(FanOutTarget(
+            name=indexer_name,
+            text_type=type,
+            db_client=indexer_instance.db_client,
+            chunker=indexer_instance.chunker,
+            deduplicator=indexer_instance.deduplicator,
+            update=updates[indexer_name],
+        ))
+        journal.start(indexer_name)
+
+    container.log().info("Use fan-out indexer", workers=args.workers, indexers=len(targets))
+    results = FanOutIndexer(
+        targets,
+        workers=args.workers,
+        batch_size=args.batch_size or DEFAULT_BATCH_SIZE,
+        checkpoint_every=args.checkpoint_every,
+        on_checkpoint=journal.checkpoint,
+    ).index({type: collection.all() for type, collection in documents.items()})
+    for indexer_name, result in results.items():
+        journal.finish(indexer_name, result)
+        container.log().info(f"success: {indexer_name}", **result.model_dump())
+
+def bootstrap(args: argparse.Namespace):
+    from rag.bootstrap.bootstrap import container
+
+    if args.embedding_workers:
+        container.embedding_driver().start_workers(args.embedding_workers)
+    return container
+
+def read_collections(path: Path) -> dict[str, DocumentCollection]:
+    documents = {type: DocumentCollection() for type in TEXT_FIELDS}
+    for item in read_json_file(path):
+        metadata = prepare_metadata(item)
+        for type, field in TEXT_FIELDS.items():
+            if field in item:
+                documents[type].push(Document(text=item[field], metadata=metadata))
+    return documents
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--dataset_filename", type=str, required=True, help="Имя файла в дирректории dataset")
+    parser.add_argument("--mode", type=str, default='create', choices=['create', 'update'], help="Режим индексации")
+    parser.add_argument("--batch_size", type=int, default=None, help="Размер батча эмбеддинга, включает потоковую индексацию")
+    parser.add_argument("--queue_depth", type=int, default=4, help="Максимальное число батчей в очереди между стадиями потоковой индексации")
+    parser.add_argument("--workers", type=int, default=None, help="Число процессов для разбиения, включает однопроходную индексацию во все БД")
+    parser.add_argument("--checkpoint_every", type=int, default=None, help="Сохранять БД каждые N проиндексированных документов")
+    parser.add_argument("--resume", action='store_true', help="Продолжить прерванную задачу с последнего чекпоинта")
+    parser.add_argument("--embedding_workers", type=int, default=None, help="Число процессов эмбеддинга, каждый со своей моделью на своих ядрах")
+    args = parser.parse_args()
+    if args.checkpoint_every and not args.batch_size and not args.workers:
+        args.batch_size = DEFAULT_BATCH_SIZE
+    return args
+
+def main() -> None:
+    args = parse_args()
+    path = dataset_path(args.dataset_filename)
+    if not path.is_file():
+        raise DatasetFileNotFound(path)
+
+    indexer_configs = yaml_load_config(config_path('indexer_factory.yaml'))
+    indexer_names = {
+        'forward_indexer__documents': 'text',
+        'forward_indexer__documents__html': 'html',
+        'forward_indexer__documents__md': 'md',
+    }
+    for splitter_name in indexer_configs.get('splitter_indexer'):
+        type = get_indexer_type(str(splitter_name))
+        indexer_names[f"splitter_indexer__{splitter_name}"] = type if type in TEXT_FIELDS else 'text'
+    for hierarchical_name in indexer_configs.get('hierarchical_indexer', {}):
+        type = get_indexer_type(str(hierarchical_name))
+        indexer_names[f"hierarchical_indexer__{hierarchical_name}"] = type if type in TEXT_FIELDS else 'text'
+
+    journal = IndexJournal.open(data_path(f"jobs/indexer_auto_{path.stem}.json"), path, resume=args.resume)
+    updates = {}
+    for indexer_name in list(indexer_names):
+        if journal.is_done(indexer_name):
+            journal.skip(indexer_name)
+            del indexer_names[indexer_name]
+            continue
+        # Прерванный индексатор продолжает работу поверх последнего чекпоинта
+        updates[indexer_name] = args.mode == 'update' or journal.is_started(indexer_name)
+
+    if args.workers:
+        documents = read_collections(path)
+
+        # optimization init
+        container = bootstrap(args)
+
+        fan_out_indexer(container, indexer_names, documents, journal, updates, args)
+    elif args.batch_size:
+        # optimization init
+        container = bootstrap(args)
+
+        # Датасет перечитывается для каждого индексатора, в памяти держатся только батчи в очередях
+        for indexer_name, type in indexer_names.items():
+            stream_indexer(
+                container, indexer_name, read_documents(path, TEXT_FIELDS[type]), journal, updates[indexer_name], args
+            )
     else:
-        indexer(container, indexer_name, simple_text)
+        documents = read_collections(path)
+
+        # optimization init
+        container = bootstrap(args)
+
+        for indexer_name, type in indexer_names.items():
+            indexer(container, indexer_name, documents[type], journal, updates[indexer_name])
+
+    container.log().info('Indexing job summary', **journal.summary())
+
+if __name__ == "__main__":
+    main()
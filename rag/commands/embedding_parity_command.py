@@ -0,0 +1,60 @@
+import time
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+from tqdm import tqdm
+from rag.drivers.embeddings.embedding import EmbeddingWrapper
+from rag.utils.logger import logger
+
+@dataclass
+class EmbeddingParityReport:
+    texts: int
+    mean_cosine: float
+    min_cosine: float
+    # Доля текстов, вектор которых отличается от эталонного сильнее max_drift
+    drifted: float
+    reference_seconds: float
+    candidate_seconds: float
+
+class EmbeddingParityCommand:
+    """
+    Расхождение векторов модели на другом бэкенде (например, ONNX с int8 квантованием) с эталонным torch бэкендом:
+    косинусная близость векторов одного и того же текста и время эмбеддинга.
+    """
+    def __init__(self, batch_size: int = 64, max_drift: float = 0.01) -> None:
+        self.batch_size = batch_size
+        self.max_drift = max_drift
+
+    def execute(self, reference: EmbeddingWrapper, candidate: EmbeddingWrapper, texts: List[str]) -> EmbeddingParityReport:
+        if not texts:
+            raise ValueError("No texts found for parity check")
+
+        cosines = []
+        reference_time = candidate_time = 0.0
+        progress = tqdm(total=len(texts), desc=f"Parity {candidate.backend} vs {reference.backend}")
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            # Кеш эмбеддингов обходится: сравниваются векторы, посчитанные моделями сейчас
+            begin = time.perf_counter()
+            expected = np.array(reference.get_embedding().embed_documents(batch), dtype=np.float32)
+            reference_time += time.perf_counter() - begin
+            begin = time.perf_counter()
+            actual = np.array(candidate.get_embedding().embed_documents(batch), dtype=np.float32)
+            candidate_time += time.perf_counter() - begin
+
+            norms = np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+            cosines.extend(((expected * actual).sum(axis=1) / np.where(norms > 0, norms, 1)).tolist())
+            progress.update(len(batch))
+        progress.close()
+
+        cosines = np.array(cosines)
+        report = EmbeddingParityReport(
+            texts=len(texts),
+            mean_cosine=float(cosines.mean()),
+            min_cosine=float(cosines.min()),
+            drifted=float((cosines < 1 - self.max_drift).mean()),
+            reference_seconds=reference_time,
+            candidate_seconds=candidate_time,
+        )
+        logger().info(f"Cosine drift of {candidate.backend} against {reference.backend}: {1 - report.mean_cosine:.6f}")
+        return report
@@ -0,0 +1,88 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+from tqdm import tqdm
+from rag.drivers.databases.faiss_db import FaissDB
+from rag.entities.vector_store import VectorStoreBatchQueryParams, VectorSearchResult
+from rag.utils.logger import logger
+
+@dataclass
+class RecallReport:
+    database: str
+    reference: str
+    questions: int
+    max_results: int
+    recall: float
+    index_bytes: int
+    reference_index_bytes: int
+    search_ms: float
+    reference_search_ms: float
+
+class EvaluationRecallCommand:
+    """
+    Потеря полноты БД с пониженной размерностью векторов относительно БД с полной размерностью:
+    recall@k - доля фрагментов из top-k эталонной БД, найденных в top-k оцениваемой.
+    Обе БД должны быть проиндексированы одной моделью эмбеддингов.
+    """
+    def __init__(self, max_results: int = 5, batch_size: int = 64) -> None:
+        self.max_results = max_results
+        self.batch_size = batch_size
+
+    def execute(
+            self,
+            db_name: str,
+            db: FaissDB,
+            reference_name: str,
+            reference: FaissDB,
+            questions: List[Dict]
+    ) -> RecallReport:
+        if not questions:
+            raise ValueError("No questions found for evaluation")
+
+        questions = [question_data["question"] for question_data in questions]
+        embeddings = db.get_embeddings()
+        recall_sum = 0.0
+        search_time = reference_time = 0.0
+
+        progress = tqdm(total=len(questions), desc=f"Recall {db_name} vs {reference_name}")
+        for start in range(0, len(questions), self.batch_size):
+            batch = questions[start:start + self.batch_size]
+            # Векторы вопросов общие: различие результатов даёт только преобразование индекса
+            params = VectorStoreBatchQueryParams(embeddings=embeddings.embed_queries(batch), max_results=self.max_results)
+
+            expected, elapsed = self._search(reference, params)
+            reference_time += elapsed
+            found, elapsed = self._search(db, params)
+            search_time += elapsed
+
+            for expected_results, found_results in zip(expected, found):
+                recall_sum += self._recall(expected_results, found_results)
+            progress.update(len(batch))
+        progress.close()
+
+        report = RecallReport(
+            database=db_name,
+            reference=reference_name,
+            questions=len(questions),
+            max_results=self.max_results,
+            recall=recall_sum / len(questions),
+            index_bytes=db.db_file.stat().st_size,
+            reference_index_bytes=reference.db_file.stat().st_size,
+            search_ms=search_time * 1000 / len(questions),
+            reference_search_ms=reference_time * 1000 / len(questions),
+        )
+        logger().info(f"Recall@{self.max_results} of {db_name} against {reference_name}: {report.recall:.4f}")
+        return report
+
+    @staticmethod
+    def _search(db: FaissDB, params: VectorStoreBatchQueryParams) -> tuple[list[list[VectorSearchResult]], float]:
+        start = time.perf_counter()
+        results = db.search_batch_with_scores(params)
+        return results, time.perf_counter() - start
+
+    @staticmethod
+    def _recall(expected: List[VectorSearchResult], found: List[VectorSearchResult]) -> float:
+        if not expected:
+            return 1.0
+        found_texts = {result.document.page_content for result in found}
+        return sum(result.document.page_content in found_texts for result in expected) / len(expected)
@@ -1,8 +1,9 @@
 from typing import Dict, List, Tuple, Generator
+import numpy as np
 from tqdm import tqdm
 from rag.drivers.databases.faiss_db import FaissDB
 from rag.drivers.embeddings.embedding import EmbeddingWrapper
-from rag.entities.vector_store import VectorStoreQueryParams
+from rag.entities.vector_store import VectorStoreBatchQueryParams, VectorSearchResult
 from rag.modules.metrics.quality import QualityAnalyzer
 from rag.modules.metrics.metrics import MetricsCollection
 from rag.services.vector_evaluation_service import VectorEvaluationService
@@ -15,13 +16,17 @@ class EvaluationVectorDBCommand:
             embedding: EmbeddingWrapper,
             vector_eval: VectorEvaluationService,
             metrics_collector: MetricsCollection,
-            max_results: int = 5
+            max_results: int = 5,
+            batch_size: int = 64
     ):
         self.quality_analyzer = quality_analyzer
         self.embedding = embedding
         self.vector_eval = vector_eval
         self.metrics_collector = metrics_collector
         self.max_results = max_results
+        self.batch_size = batch_size
+        # model_name -> вопрос -> вектор: каждый вопрос эмбеддится один раз за запуск для каждой модели
+        self.question_embeddings: Dict[str, Dict[str, list]] = {}
 
     def execute(
             self,
@@ -45,6 +50,9 @@ class EvaluationVectorDBCommand:
             except Exception as e:
                 logger().error(f"Error evaluating database {db_name}: {str(e)}")
                 failed_dbs.append(db_name)
+            finally:
+                # БД открываются лениво, в памяти держится только оцениваемая
+                db.unload()
 
         if failed_dbs:
             logger().warning(
@@ -63,59 +71,85 @@ class EvaluationVectorDBCommand:
 
         print(f"\nEvaluating database: {db_name}")
 
-        for i, question_data in enumerate(tqdm(questions[:100], desc=f"Processing questions for {db_name}")):
-            question = question_data["question"]
-
+        questions = [question_data["question"] for question_data in questions[:100]]
+        progress = tqdm(total=len(questions), desc=f"Processing questions for {db_name}")
+        for start in range(0, len(questions), self.batch_size):
+            batch = questions[start:start + self.batch_size]
             try:
-                documents = db.search(VectorStoreQueryParams(query=question, max_results=self.max_results))
-
-                if len(documents) == 0:
-                    continue
-
-                query_embedding = self.embedding.embed_query(question)
-                document_texts = [doc.page_content for doc in documents]
-                document_embeddings = self.embedding.embed_documents(document_texts)
-
-                similarities = self.vector_eval.cosine([query_embedding], document_embeddings)
-
-                doc_data = []
-                for j, doc in enumerate(documents):
-                    doc_data.append({
-                        "content": doc.page_content,
-                        "similarity": float(similarities[j]),
-                        "metadata": doc.metadata if hasattr(doc, 'metadata') else {}
-                    })
-
-                self.metrics_collector.start_operation("vector_search")
-                
-                search_metrics = self.quality_analyzer.analyze_search_quality(
-                    query=question,
-                    similarity_scores=similarities,
-                    documents=doc_data,
-                    db_name=db_name
-                )
-
-                result = {
-                    "question": question,
-                    "db_name": db_name,
-                    "metrics": {
-                        "avg_similarity_score": search_metrics.avg_similarity_score,
-                        "max_similarity_score": search_metrics.max_similarity_score,
-                        "min_similarity_score": search_metrics.min_similarity_score,
-                        "similarity_std": search_metrics.similarity_std,
-                        "retrieved_count": search_metrics.retrieved_count
-                    },
-                    "documents": doc_data
-                }
-
-                question_results.append(result)
-                processed_count += 1
-
+                # Один поиск по индексу на пакет вопросов, векторы вопросов общие для всех БД одной модели
+                query_embeddings = self._question_embeddings(db, batch)
+                results = db.search_batch_with_scores(VectorStoreBatchQueryParams(
+                    embeddings=query_embeddings,
+                    max_results=self.max_results
+                ))
             except Exception as e:
-                logger().error(f"Error processing question '{question}' for DB '{db_name}': {str(e)}")
+                logger().error(f"Error searching questions batch for DB '{db_name}': {str(e)}")
+                progress.update(len(batch))
+                continue
+
+            for question, scored in zip(batch, results):
+                try:
+                    result = self._evaluate_question(db_name, question, scored)
+                    if result is not None:
+                        question_results.append(result)
+                        processed_count += 1
+                except Exception as e:
+                    logger().error(f"Error processing question '{question}' for DB '{db_name}': {str(e)}")
+                progress.update(1)
+        progress.close()
 
         return {
             "database": db_name,
             "total_processed": processed_count,
             "results": question_results
-        } 
\ No newline at end of file
+        }
+
+    def _question_embeddings(self, db: FaissDB, questions: List[str]) -> List[list]:
+        embeddings = db.get_embeddings()
+        cache = self.question_embeddings.setdefault(getattr(embeddings, 'model_name', str(id(embeddings))), {})
+        missing = list(dict.fromkeys(question for question in questions if question not in cache))
+        if missing:
+            cache.update(zip(missing, embeddings.embed_queries(missing)))
+        return [cache[question] for question in questions]
+
+    def _evaluate_question(
+            self,
+            db_name: str,
+            question: str,
+            scored: List[VectorSearchResult]
+    ) -> Dict|None:
+        if len(scored) == 0:
+            return None
+
+        # Косинусная близость посчитана при поиске по точным векторам фрагментов, см. FaissDB.search_batch_with_scores
+        similarities = np.array([result.similarity for result in scored])
+
+        doc_data = []
+        for result in scored:
+            doc_data.append({
+                "content": result.document.page_content,
+                "similarity": float(result.similarity),
+                "metadata": result.document.metadata
+            })
+
+        self.metrics_collector.start_operation("vector_search")
+
+        search_metrics = self.quality_analyzer.analyze_search_quality(
+            query=question,
+            similarity_scores=similarities,
+            documents=doc_data,
+            db_name=db_name
+        )
+
+        return {
+            "question": question,
+            "db_name": db_name,
+            "metrics": {
+                "avg_similarity_score": search_metrics.avg_similarity_score,
+                "max_similarity_score": search_metrics.max_similarity_score,
+                "min_similarity_score": search_metrics.min_similarity_score,
+                "similarity_std": search_metrics.similarity_std,
+                "retrieved_count": search_metrics.retrieved_count
+            },
+            "documents": doc_data
+        }
@@ -0,0 +1,18 @@
+from abc import ABC, abstractmethod
+from rag.entities.index import IndexedDocument
+
+class DeduplicatorContract(ABC):
+    @abstractmethod
+    def reset(self) -> None:
+        """Сброс накопленных сигнатур перед новым проходом индексации."""
+        pass
+
+    @abstractmethod
+    def deduplicate(self, document: IndexedDocument) -> IndexedDocument:
+        """Удаляет фрагменты-дубликаты, запоминая их как алиасы оставленных фрагментов."""
+        pass
+
+    @abstractmethod
+    def get_aliases(self) -> dict[str, list[dict]]:
+        """id оставленного фрагмента -> список удалённых дубликатов."""
+        pass
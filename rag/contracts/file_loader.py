@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from rag.entities.document import DocumentCollection
+from typing import Iterator
+from rag.entities.document import DocumentCollection, Document
 
 class FileLoaderContract(ABC):
     @abstractmethod
     def load(self, file_path: Path) -> DocumentCollection:
         """Загрузка файлов."""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def iterate(self, file_path: Path) -> Iterator[Document]:
+        """Потоковое чтение документов без загрузки всего файла в память."""
+        pass
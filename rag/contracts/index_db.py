@@ -1,11 +1,66 @@
 from abc import ABC, abstractmethod
-from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from rag.entities.index import IndexedDocument, IndexedChunk, IndexSyncResult
 
 class IndexDBContract(ABC):
     @abstractmethod
-    def create_db(self, documents: list[Document]):
+    def create_db(self, documents: list[IndexedDocument]):
+        pass
+
+    @abstractmethod
+    def sync(self, documents: list[IndexedDocument]) -> IndexSyncResult:
+        """Инкрементальное обновление БД до переданного набора документов."""
+        pass
+
+    @abstractmethod
+    def upsert(self, documents: list[IndexedDocument]) -> list[IndexedDocument]:
+        """Добавление новых и замена изменённых документов."""
+        pass
+
+    @abstractmethod
+    def delete(self, ids: list[str]) -> None:
+        """Удаление документов по id."""
+        pass
+
+    @abstractmethod
+    def update_aliases(self, aliases: dict[str, list[dict]]) -> None:
+        """
+        Полный набор алиасов после прохода дедупликации: id фрагмента -> удалённые дубликаты.
+        Записывается в метаданные фрагментов при следующем save, у фрагментов вне набора алиасы удаляются.
+        """
+        pass
+
+    @abstractmethod
+    def document_ids(self) -> set[str]:
+        pass
+
+    @abstractmethod
+    def document_hash(self, document_id: str) -> str|None:
+        """Хеш содержимого проиндексированного документа, None если документа нет."""
+        pass
+
+    @abstractmethod
+    def embed_chunks(self, chunks: list[IndexedChunk]) -> None:
+        """Заполняет эмбеддинги фрагментов, у которых они ещё не посчитаны."""
+        pass
+
+    @abstractmethod
+    def exists(self) -> bool:
+        pass
+
+    @abstractmethod
+    def get_embeddings(self) -> Embeddings:
+        pass
+
+    @abstractmethod
+    def save(self) -> None:
+        pass
+
+    @abstractmethod
+    def checkpoint(self) -> None:
+        """Промежуточное сохранение при индексации, после которого её можно продолжить."""
         pass
 
     @abstractmethod
     def delete_db(self) -> None:
-        pass
\ No newline at end of file
+        pass
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from rag.entities.document import DocumentCollection
+from typing import Callable, Iterable
+from rag.entities.document import DocumentCollection, Document
+from rag.entities.index import IndexSyncResult
 
 class IndexerContract(ABC):
     @abstractmethod
@@ -9,4 +11,37 @@ class IndexerContract(ABC):
 
     @abstractmethod
     def index(self, documents: DocumentCollection) -> None:
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def update_by_path(self, dataset_path: Path) -> IndexSyncResult:
+        pass
+
+    @abstractmethod
+    def update(self, documents: DocumentCollection) -> IndexSyncResult:
+        pass
+
+    @abstractmethod
+    def stream_by_path(
+            self,
+            dataset_path: Path,
+            batch_size: int,
+            queue_depth: int,
+            update: bool = False,
+            checkpoint_every: int|None = None,
+            on_checkpoint: Callable[[int], None]|None = None,
+    ) -> IndexSyncResult:
+        pass
+
+    @abstractmethod
+    def stream(
+            self,
+            documents: Iterable[Document],
+            batch_size: int,
+            queue_depth: int,
+            update: bool = False,
+            checkpoint_every: int|None = None,
+            on_checkpoint: Callable[[int], None]|None = None,
+    ) -> IndexSyncResult:
+        """Потоковая индексация батчами с ограниченной памятью."""
+        pass
@@ -0,0 +1,8 @@
+from abc import ABC, abstractmethod
+from rag.entities.vector_store import VectorStoreQueryParams, VectorSearchResult
+
+class LexicalSearchContract(ABC):
+    @abstractmethod
+    def search_lexical(self, dto: VectorStoreQueryParams) -> list[VectorSearchResult]:
+        """Полнотекстовый поиск BM25: similarity - оценка BM25, distance - она же со знаком минус."""
+        pass
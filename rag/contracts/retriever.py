@@ -1,9 +1,24 @@
 from abc import ABC, abstractmethod
 from rag.entities.document import DocumentCollection
-from rag.entities.vector_store import VectorStoreQueryParams
+from rag.entities.vector_store import VectorStoreQueryParams, VectorStoreBatchQueryParams
 
 class RetrieverContract(ABC):
     @abstractmethod
     def search(self, params: VectorStoreQueryParams) -> DocumentCollection:
         """Ищет релевантные документы."""
-        pass
\ No newline at end of file
+        pass
+
+    def search_batch(self, params: VectorStoreBatchQueryParams) -> list[DocumentCollection]:
+        """Ищет документы для пакета запросов. По умолчанию запросы выполняются по одному."""
+        return [
+            self.search(VectorStoreQueryParams(
+                query=query,
+                max_results=params.max_results,
+                embedding=params.embeddings[i] if params.embeddings is not None else None,
+                granularity=params.granularity,
+                nprobe=params.nprobe,
+                ef_search=params.ef_search,
+                filter=params.filter,
+            ))
+            for i, query in enumerate(params.queries)
+        ]
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from langchain_core.documents import Document
-from rag.entities.vector_store import VectorStoreQueryParams
+from rag.entities.vector_store import VectorStoreQueryParams, VectorStoreBatchQueryParams, VectorSearchResult
 
 class VectorStoreContract(ABC):
     @abstractmethod
@@ -11,4 +11,19 @@ class VectorStoreContract(ABC):
     @abstractmethod
     def search(self, dto: VectorStoreQueryParams) -> list[Document]:
         """Поиск релевантных фрагментов."""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def search_batch(self, dto: VectorStoreBatchQueryParams) -> list[list[Document]]:
+        """Поиск релевантных фрагментов для пакета запросов."""
+        pass
+
+    @abstractmethod
+    def search_with_scores(self, dto: VectorStoreQueryParams) -> list[VectorSearchResult]:
+        """Поиск фрагментов с оценками близости и, по запросу, сохранёнными векторами."""
+        pass
+
+    @abstractmethod
+    def search_batch_with_scores(self, dto: VectorStoreBatchQueryParams) -> list[list[VectorSearchResult]]:
+        """Пакетный поиск фрагментов с оценками близости."""
+        pass
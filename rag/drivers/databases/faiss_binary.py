@@ -0,0 +1,130 @@
+import threading
+from pathlib import Path
+import faiss
+import numpy as np
+
+BINARY_INDEX_FILE: str = 'index.faiss'
+BINARY_VECTORS_FILE: str = 'vectors.npy'
+# Во сколько раз больше кандидатов отбирается по Хэммингу, чем возвращается после пересчёта
+DEFAULT_RESCORE: int = 10
+# Число единичных бит в каждом байте
+POPCOUNT: np.ndarray = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+def binary_codes(vectors: np.ndarray) -> np.ndarray:
+    """Знаковые биты компонент вектора, упакованные по 8 в байт."""
+    return np.packbits(vectors > 0, axis=1)
+
+class FaissBinaryIndex:
+    """
+    Бинарный индекс с пересчётом расстояний по полным векторам.
+    В IndexBinaryIDMap2 хранится 1 бит на компоненту вектора вместо 32: первый этап поиска отбирает
+    k * rescore кандидатов по расстоянию Хэмминга, второй считает до них точные L2 расстояния.
+    Полные векторы лежат рядом в vectors.npy в порядке кодов и при поиске открываются через mmap,
+    в память читаются только строки кандидатов.
+    Повторяет часть интерфейса faiss.Index, которую используют FaissDB и langchain FAISS.
+    """
+    is_trained: bool = True
+
+    def __init__(
+            self,
+            d: int,
+            rescore: int = DEFAULT_RESCORE,
+            codes: faiss.IndexBinary|None = None,
+            vectors: np.ndarray|None = None,
+    ) -> None:
+        self.d = d
+        self.rescore = rescore
+        self.codes = codes if codes is not None else faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat((d + 7) // 8 * 8))
+        self._vectors = vectors if vectors is not None else np.empty((0, d), dtype=np.float32)
+        # Добавленные батчи склеиваются один раз при следующем чтении векторов, а не при каждом добавлении
+        self._added: list[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    @property
+    def ntotal(self) -> int:
+        return self.codes.ntotal
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._added:
+            with self._lock:
+                if self._added:
+                    self._vectors = np.concatenate([self._vectors, *self._added])
+                    self._added = []
+        return self._vectors
+
+    @vectors.setter
+    def vectors(self, vectors: np.ndarray) -> None:
+        with self._lock:
+            self._vectors = vectors
+            self._added = []
+
+    @classmethod
+    def read(cls, path: Path, writable: bool, rescore: int = DEFAULT_RESCORE) -> 'FaissBinaryIndex':
+        # Коды IndexBinaryFlat faiss через mmap не читает, они всегда копируются в память
+        codes = faiss.read_index_binary(str(path / BINARY_INDEX_FILE))
+        vectors = np.load(path / BINARY_VECTORS_FILE, mmap_mode=None if writable else 'r')
+        return cls(vectors.shape[1], rescore, codes, vectors)
+
+    def write(self, path: Path) -> None:
+        faiss.write_index_binary(self.codes, str(path / BINARY_INDEX_FILE))
+        np.save(path / BINARY_VECTORS_FILE, np.asarray(self.vectors))
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.codes.add_with_ids(binary_codes(vectors), ids)
+        with self._lock:
+            self._added.append(np.array(vectors))
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        self.vectors = np.delete(self.vectors, np.flatnonzero(np.isin(self._id_map(), ids)), axis=0)
+        return self.codes.remove_ids(ids)
+
+    def reconstruct(self, vector_id: int) -> np.ndarray:
+        return np.array(self.vectors[self._positions(np.array([vector_id]))[0]])
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        return np.array(self.vectors[self._positions(ids)])
+
+    def search(self, vectors: np.ndarray, k: int, ids: np.ndarray|None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Поиск в формате faiss.Index.search, ids - ограничение поиска подмножеством векторов."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        distances = np.full((len(vectors), k), np.inf, dtype=np.float32)
+        labels = np.full((len(vectors), k), -1, dtype=np.int64)
+        total = self.ntotal if ids is None else len(ids)
+        if not total:
+            return distances, labels
+
+        size = min(k * self.rescore, total)
+        if ids is None:
+            _, candidates = self.codes.search(binary_codes(vectors), size)
+        else:
+            candidates = self._subset_candidates(binary_codes(vectors), ids, size)
+
+        for row, (query, row_candidates) in enumerate(zip(vectors, candidates)):
+            row_candidates = row_candidates[row_candidates >= 0]
+            scores = ((self.vectors[self._positions(row_candidates)] - query) ** 2).sum(axis=1)
+            order = np.argsort(scores)[:k]
+            distances[row, :len(order)] = scores[order]
+            labels[row, :len(order)] = row_candidates[order]
+        return distances, labels
+
+    def _subset_candidates(self, queries: np.ndarray, ids: np.ndarray, size: int) -> np.ndarray:
+        """Ближайшие по Хэммингу среди ids: IndexBinary не принимает селектор id, поэтому расстояния считаются здесь."""
+        flat = faiss.downcast_IndexBinary(self.codes.index)
+        codes = faiss.rev_swig_ptr(flat.xb.data(), flat.xb.size()).reshape(-1, flat.code_size)[self._positions(ids)]
+        candidates = np.empty((len(queries), size), dtype=np.int64)
+        for row, query in enumerate(queries):
+            hamming = POPCOUNT[codes ^ query].sum(axis=1)
+            candidates[row] = ids[np.argpartition(hamming, size - 1)[:size]] if size < len(ids) else ids
+        return candidates
+
+    def _id_map(self) -> np.ndarray:
+        if not self.ntotal:
+            return np.empty(0, dtype=np.int64)
+        return faiss.rev_swig_ptr(self.codes.id_map.data(), self.codes.id_map.size())
+
+    def _positions(self, ids: np.ndarray) -> np.ndarray:
+        # faiss_index импортирует этот модуль, поэтому импорт отложен до вызова
+        from rag.drivers.databases.faiss_index import id_map_positions
+        return id_map_positions(self._id_map(), ids)
@@ -1,12 +1,38 @@
+import pickle
+import shutil
+import threading
 from pathlib import Path
+import faiss
+import numpy as np
+from collections.abc import Mapping
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_core.embeddings import Embeddings
 from langchain.schema import Document
 from rag.contracts.index_db import IndexDBContract
+from rag.contracts.lexical_search import LexicalSearchContract
 from rag.contracts.vector_store import VectorStoreContract
-from rag.entities.vector_store import VectorStoreQueryParams
+from rag.drivers.databases.faiss_binary import FaissBinaryIndex, BINARY_VECTORS_FILE
+from rag.drivers.databases.faiss_db_pool import FaissDBPool
+from rag.drivers.databases.faiss_index import (
+    FaissIndexBuilder, FaissIndexInfo, FaissIndexDeleteError, filtered_search, INDEX_INFO_FILE
+)
+from rag.drivers.databases.faiss_manifest import FaissManifest
+from rag.drivers.databases.faiss_versions import FaissVersionStore
+from rag.drivers.databases.snapshot_archive import SnapshotArchive, SnapshotStats
+from rag.drivers.databases.sqlite_docstore import SqliteDocstore, DOCSTORE_FILE
+from rag.entities.index import IndexedDocument, IndexedChunk, IndexSyncResult, IndexSyncCounter
+from rag.entities.vector_store import VectorStoreQueryParams, VectorStoreBatchQueryParams, VectorSearchResult, MetadataFilter
+from rag.utils.logger import logger
 from rag.utils.path import absolute_path
 
+DB_FILES: tuple[str, ...] = ('index.faiss', DOCSTORE_FILE, 'manifest.json')
+LEGACY_DOCSTORE_FILE: str = 'index.pkl'
+# Векторы чекпоинта, записанного до обучения индекса, фрагменты лежат в docstore в том же порядке
+PENDING_VECTORS_FILE: str = 'pending.npy'
+MMAP_IO_FLAGS: int = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
 class FaissDBNotInitError(Exception):
     def __init__(self) -> None:
         super().__init__(f"Faiss DB not init")
@@ -19,38 +45,670 @@ class FaissDatasetNotExistError(Exception):
     def __init__(self, file_dataset: str) -> None:
         super().__init__(f"Dataset file {file_dataset} does not exist")
 
-class FaissDB(VectorStoreContract, IndexDBContract):
+class FaissLexicalIndexNotFoundError(Exception):
+    def __init__(self, db_path: str) -> None:
+        super().__init__(f"DB {db_path} has no lexical index, it will be built on next save")
+
+class FaissManifestNotFoundError(Exception):
+    def __init__(self, db_path: str) -> None:
+        super().__init__(f"DB {db_path} has no manifest, incremental update is impossible. Recreate the DB")
+
+def matches_filter(document: Document|str, filter: MetadataFilter) -> bool:
+    """docstore.search возвращает строку, если документ не найден."""
+    if not isinstance(document, Document):
+        return False
+    return all(
+        document.metadata.get(field) in (values if isinstance(values, (list, tuple, set)) else [values])
+        for field, values in filter.items()
+    )
+
+class FaissDB(VectorStoreContract, IndexDBContract, LexicalSearchContract):
+    db_files: tuple[str, ...] = DB_FILES
+
     def __init__(
             self,
             db_path: Path|str,
             embeddings: Embeddings,
+            index: dict|None = None,
+            pool: FaissDBPool|None = None,
+            versions: FaissVersionStore|None = None,
     ) -> None:
+        """
+        index - тип ANN индекса и его параметры, см. FaissIndexBuilder. По умолчанию точный flat индекс.
+        pool - пул, ограничивающий память, занятую открытыми БД.
+        versions - версии файлов БД, по умолчанию свои версии в db_path.
+        """
         self.embeddings = embeddings
+        self.pool = pool
         self.db_path = absolute_path(db_path)
-        self.db_file = absolute_path(f"{db_path}/index.faiss")
-        self.db = None
-        if self.db_file.exists():
-            self.db = FAISS.load_local(str(self.db_path), self.embeddings, allow_dangerous_deserialization=True)
+        self.versions = versions or FaissVersionStore(self.db_path)
+        self.index_builder = self._index_builder(index)
+        # Тип открытого индекса: из index.json версии, для нового индекса - из конфигурации
+        self.index_info = FaissIndexInfo.from_builder(self.index_builder)
+        # Векторы, накопленные для обучения индекса до его создания
+        self.pending: list[IndexedChunk] = []
+        # Алиасы дубликатов, записываемые при следующем save, см. update_aliases
+        self.aliases: dict[str, list[dict]]|None = None
+        self.next_id = 0
+        # БД читается с диска при первом обращении, см. load
+        self._db = None
+        self._manifest = None
+        self._loaded = False
+        self._manifest_loaded = False
+        self._readonly = False
+        self._memory_usage = 0
+        self._stamp = None
+        self._lock = threading.RLock()
+
+    @property
+    def data_path(self) -> Path:
+        """Директория с файлами текущей версии БД."""
+        return self.versions.current_path()
+
+    @property
+    def db_file(self) -> Path:
+        return self.data_path / 'index.faiss'
+
+    @property
+    def manifest_file(self) -> Path:
+        return self.data_path / 'manifest.json'
+
+    @property
+    def db(self) -> FAISS|None:
+        if not self._loaded:
+            self.load()
+        return self._db
+
+    @db.setter
+    def db(self, db: FAISS|None) -> None:
+        self._db = db
+        self._loaded = True
+        self._readonly = False
+
+    @property
+    def manifest(self) -> FaissManifest|None:
+        if not self._manifest_loaded:
+            with self._lock:
+                if not self._manifest_loaded:
+                    if self.manifest_file.exists():
+                        self._manifest = FaissManifest.load(self.manifest_file)
+                    else:
+                        # БД, созданная до появления manifest, не поддерживает инкрементальное обновление
+                        self._manifest = None if self.db_file.exists() else FaissManifest()
+                    self._manifest_loaded = True
+        return self._manifest
+
+    @manifest.setter
+    def manifest(self, manifest: FaissManifest|None) -> None:
+        self._manifest = manifest
+        self._manifest_loaded = True
+
+    def load(self, writable: bool = False) -> None:
+        """
+        Читает БД с диска.
+        Для поиска инвертированные списки IVF индекса отображаются в память через mmap только для чтения
+        и разделяются между процессами через page cache ОС. Остальные типы faiss через mmap не читает,
+        они копируются в память процесса целиком. Перед изменением БД индекс перечитывается целиком.
+        """
+        with self._lock:
+            if self._loaded and not (writable and self._readonly):
+                return
+            # Отпечаток берётся до чтения версии: публикация между ними вызовет лишнюю, но не пропущенную перезагрузку
+            self._stamp = self.versions.stamp()
+            path = self.data_path
+            if not (path / 'index.faiss').exists():
+                self.db = None
+                if (path / PENDING_VECTORS_FILE).exists():
+                    self.pending = self._read_pending(path)
+                return
+
+            info_file = path / INDEX_INFO_FILE
+            # БД, сохранённая до появления index.json, описывается конфигурацией
+            self.index_info = (
+                FaissIndexInfo.load(info_file) if info_file.exists() else FaissIndexInfo.from_builder(self.index_builder)
+            )
+            # БД, открытая без конфигурации индекса, настраивается и дописывается по сохранённой
+            if self.index_builder is None:
+                self.index_builder = self._index_builder(self.index_info.config)
+            index = self._read_index(path, writable)
+            docstore, index_to_docstore_id = self._read_docstore(path, writable)
+            self.db = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+            self._readonly = not writable
+            # Индекс учитывается полным размером файла, даже если он открыт через mmap.
+            # Полные векторы бинарного индекса читаются с диска только для кандидатов и в оценку не входят
+            self._memory_usage = sum(
+                file.stat().st_size
+                for file in (path / 'index.faiss', path / DOCSTORE_FILE, path / LEGACY_DOCSTORE_FILE)
+                if file.exists()
+            )
+            # Новые id векторов нужны только при изменении БД
+            self.next_id = max(index_to_docstore_id, default=-1) + 1 if writable else 0
+            if self.index_builder:
+                self.index_builder.tune(index)
+
+        if self.pool:
+            self.pool.register(self)
+
+    def unload(self) -> None:
+        """Освобождает память, БД будет прочитана заново при следующем обращении."""
+        with self._lock:
+            self._db = None
+            self._loaded = False
+            self._readonly = False
+        if self.pool:
+            self.pool.release(self)
+
+    def refresh(self) -> bool:
+        """
+        Подхватывает версию БД, опубликованную другим процессом.
+        Запросы, уже получившие ссылку на старую версию, дорабатывают на ней.
+        """
+        if not self._readonly or self.versions.stamp() == self._stamp:
+            return False
+        with self._lock:
+            if not self._readonly or self.versions.stamp() == self._stamp:
+                return False
+            logger().info(f"Reload DB {self.db_path}: version {self.versions.current()}")
+            self.unload()
+            self._manifest_loaded = False
+            self.load()
+        return True
+
+    def is_loaded(self) -> bool:
+        return self._loaded and self._db is not None
+
+    def is_evictable(self) -> bool:
+        """Выгружать можно только БД без несохранённых изменений, открытые для чтения."""
+        return self._readonly and not self.pending
+
+    def memory_usage(self) -> int:
+        """Оценка занятой памяти по полному размеру файлов индекса и docstore."""
+        return self._memory_usage
 
-    def create_db(self, documents: list[Document|str]) -> FAISS:
-        if self.db_file.exists():
+    def create_db(self, documents: list[IndexedDocument]) -> FAISS:
+        if self.exists():
             raise FaissDBExistError(str(self.db_file))
 
-        self.db = FAISS.from_documents(documents, self.embeddings)
-        self.db.save_local(str(self.db_path))
+        self.sync(documents)
         return self.db
 
+    def sync(self, documents: list[IndexedDocument]) -> IndexSyncResult:
+        """Приводит БД к переданному набору документов: добавляет новые, заменяет изменённые, удаляет отсутствующие."""
+        counter = IndexSyncCounter()
+        for document in documents:
+            counter.count(document, self._get_manifest().get_hash(document.id))
+
+        # Из документов с одинаковым id в БД попадает последний, см. upsert
+        self.upsert(documents)
+        stale_ids = list(self.manifest.document_ids() - counter.seen_ids)
+        self.delete(stale_ids)
+        counter.result.deleted = len(stale_ids)
+        self.save()
+        return counter.result
+
+    def upsert(self, documents: list[IndexedDocument]) -> list[IndexedDocument]:
+        self.load(writable=True)
+        manifest = self._get_manifest()
+        changed = {}
+        for document in {document.id: document for document in documents}.values():
+            if manifest.get_hash(document.id) != document.hash:
+                changed[document.id] = document
+        if not changed:
+            return []
+
+        self._delete_chunks([chunk_id for document_id in changed for chunk_id in manifest.chunk_ids(document_id)])
+        self._add_chunks([chunk for document in changed.values() for chunk in document.chunks])
+        for document in changed.values():
+            manifest.put(document.id, document.hash, [chunk.id for chunk in document.chunks])
+
+        return list(changed.values())
+
+    def delete(self, ids: list[str]) -> None:
+        self.load(writable=True)
+        manifest = self._get_manifest()
+        self._delete_chunks([chunk_id for document_id in ids for chunk_id in manifest.chunk_ids(document_id)])
+        for document_id in ids:
+            manifest.remove(document_id)
+
+    def update_aliases(self, aliases: dict[str, list[dict]]) -> None:
+        """Алиасы записываются в метаданные тем же save, что и фрагменты прохода, см. _apply_aliases."""
+        self.aliases = aliases
+
+    def document_ids(self) -> set[str]:
+        return self._get_manifest().document_ids()
+
+    def document_hash(self, document_id: str) -> str|None:
+        return self._get_manifest().get_hash(document_id)
+
+    def exists(self) -> bool:
+        return self.db_file.exists() or (self.data_path / PENDING_VECTORS_FILE).exists()
+
+    def embed_chunks(self, chunks: list[IndexedChunk]) -> None:
+        missing = [chunk for chunk in chunks if chunk.embedding is None]
+        if not missing:
+            return
+
+        embeddings = self.embeddings.embed_documents([chunk.text for chunk in missing])
+        for chunk, embedding in zip(missing, embeddings):
+            chunk.embedding = embedding
+
+    def save(self) -> None:
+        """
+        Записывает новую версию БД во временную директорию и публикует её атомарно, см. FaissVersionStore.
+        Индекс, ожидающий обучения, обучается на всех накопленных векторах.
+        """
+        if self.aliases is not None:
+            self.load(writable=True)
+        if self.pending:
+            self._train()
+        if self.aliases is not None and self.db is not None:
+            self._apply_aliases()
+        self._publish()
+        self.aliases = None
+
+    def checkpoint(self) -> None:
+        """
+        Промежуточное сохранение при индексации.
+        Векторы, накопленные для обучения индекса, записываются как есть: индекс обучится,
+        когда их наберётся train_size, или при save, а не на выборке первого чекпоинта.
+        """
+        if self.pending:
+            self._publish()
+        else:
+            self.save()
+
+    def export_snapshot(self, archive: Path, snapshots: SnapshotArchive|None = None) -> SnapshotStats:
+        """Упаковывает файлы текущей версии БД в сжатый архив, см. SnapshotArchive."""
+        if not self.exists():
+            raise FaissDatasetNotExistError(str(self.db_path))
+        path = self.data_path
+        # Все файлы версии, включая файлы наследников
+        file_names = sorted(file.name for file in path.iterdir() if file.is_file())
+        return (snapshots or SnapshotArchive()).pack(path, file_names, archive)
+
+    def import_snapshot(self, archive: Path, snapshots: SnapshotArchive|None = None) -> SnapshotStats:
+        """Распаковывает архив в новую версию БД и публикует её, читатели подхватят её без перезапуска."""
+        tmp_path = self.versions.prepare()
+        try:
+            stats = (snapshots or SnapshotArchive()).unpack(archive, tmp_path)
+            self.versions.publish(tmp_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        self._remove_legacy_files()
+        self.discard()
+        return stats
+
+    def discard(self) -> None:
+        """Отбрасывает несохранённые изменения: БД будет прочитана с диска при следующем обращении."""
+        with self._lock:
+            self.unload()
+            self.pending = []
+            self.aliases = None
+            self._manifest_loaded = False
+
     def delete_db(self) -> None:
         path = str(self.db_path)
-        if not self.db_file.exists():
+        if not self.exists():
             raise FaissDatasetNotExistError(path)
-        self.db_file.unlink()
+        self.versions.clear()
+        self._remove_legacy_files()
         self.db = None
+        self.pending = []
+        self.aliases = None
+        self.next_id = 0
+        self.manifest = FaissManifest()
 
     def search(self, dto: VectorStoreQueryParams) -> list[Document]:
+        if dto.filter:
+            return self.search_batch(dto.to_batch())[0]
+
+        db = self._acquire()
+        self._tune(db, dto)
+        if dto.embedding is not None:
+            return db.similarity_search_by_vector(dto.embedding, k=dto.max_results)
+        return db.similarity_search(query=dto.query, k=dto.max_results)
+
+    def search_batch(self, dto: VectorStoreBatchQueryParams) -> list[list[Document]]:
+        """Один батч эмбеддинга и один поиск по индексу для всех запросов."""
+        db = self._acquire()
+        self._tune(db, dto)
+        return [
+            [document for document, _, _ in hits]
+            for hits in self._search_vectors(db, self._query_vectors(db, dto), dto.max_results, self._filter_ids(db, dto))
+        ]
+
+    def search_with_scores(self, dto: VectorStoreQueryParams) -> list[VectorSearchResult]:
+        return self.search_batch_with_scores(dto.to_batch())[0]
+
+    def search_batch_with_scores(self, dto: VectorStoreBatchQueryParams) -> list[list[VectorSearchResult]]:
+        """
+        Расстояния берутся из индекса. Индекс с точными векторами не требует повторного эмбеддинга фрагментов:
+        для нормализованных векторов косинус считается из L2 расстояния: cos = 1 - d / 2,
+        иначе по восстановленным из индекса векторам.
+        Индексы с потерями (квантование, понижение размерности) хранят приближённые векторы,
+        поэтому косинус считается по точным эмбеддингам найденных фрагментов из кеша эмбеддингов,
+        иначе оценки разных БД были бы несопоставимы.
+        """
+        db = self._acquire()
+        self._tune(db, dto)
+        vectors = self._query_vectors(db, dto)
+        return [
+            self._scored_results(db, vector, hits, dto.with_vectors)
+            for vector, hits in zip(vectors, self._search_vectors(db, vectors, dto.max_results, self._filter_ids(db, dto)))
+        ]
+
+    def search_lexical(self, dto: VectorStoreQueryParams) -> list[VectorSearchResult]:
+        """BM25 поиск по полнотекстовому индексу фрагментов, который строится в docstore при save."""
+        docstore = self._acquire().docstore
+        if not isinstance(docstore, SqliteDocstore) or not docstore.has_lexical_index():
+            raise FaissLexicalIndexNotFoundError(str(self.db_path))
+        return [
+            VectorSearchResult(document=document, distance=-score, similarity=score)
+            for document, score in docstore.lexical_search(dto.query, dto.max_results, dto.filter)
+        ]
+
+    def get_db_path(self) -> Path:
+        return self.db_path
+
+    def get_embeddings(self) -> Embeddings:
+        return self.embeddings
+
+    @staticmethod
+    def _index_builder(index: dict|None) -> FaissIndexBuilder|None:
+        """Точный индекс без преобразования векторов ведёт langchain, остальные строит FaissIndexBuilder."""
+        if index and (index.get('type', 'flat') != 'flat' or index.get('transform')):
+            return FaissIndexBuilder(**index)
+        return None
+
+    def _read_index(self, path: Path, writable: bool) -> faiss.Index|FaissBinaryIndex:
+        if (path / BINARY_VECTORS_FILE).exists():
+            return FaissBinaryIndex.read(path, writable)
+        index_file = str(path / 'index.faiss')
+        if not writable and self.index_info.mmap:
+            try:
+                return faiss.read_index(index_file, MMAP_IO_FLAGS)
+            except RuntimeError:
+                # Индекс, записанный до смены типа в конфигурации, может не поддерживать mmap
+                pass
+        return faiss.read_index(index_file)
+
+    def _read_docstore(self, path: Path, writable: bool) -> tuple[Docstore, Mapping[int, str]]:
+        docstore_file = path / DOCSTORE_FILE
+        if docstore_file.exists():
+            docstore = SqliteDocstore(docstore_file)
+            return docstore, docstore.read_index_map() if writable else docstore.index_map()
+
+        logger().warning(f"DB {self.db_path} uses legacy pickled docstore, it will be converted on next save")
+        with open(path / LEGACY_DOCSTORE_FILE, 'rb') as file:
+            return pickle.load(file)
+
+    def _publish(self) -> None:
+        if self.db is None and not self.pending:
+            raise FaissDBNotInitError()
+
+        tmp_path = self.versions.prepare()
+        try:
+            self._save_files(tmp_path)
+            path = self.versions.publish(tmp_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        self._stamp = self.versions.stamp()
+        self._remove_legacy_files()
         if self.db is None:
+            return
+
+        # Изменения записаны в файл, дальше документы читаются из него
+        docstore = self.db.docstore
+        self.db.docstore = SqliteDocstore(path / DOCSTORE_FILE)
+        if isinstance(docstore, SqliteDocstore):
+            docstore.close()
+
+    def _save_files(self, path: Path) -> None:
+        if self.db is None:
+            self._save_pending(path)
+        elif isinstance(self.db.index, FaissBinaryIndex):
+            self.db.index.write(path)
+        else:
+            faiss.write_index(self.db.index, str(path / 'index.faiss'))
+        if self.db is not None:
+            self.index_info.save(path / INDEX_INFO_FILE)
+            docstore = self.db.docstore
+            if not isinstance(docstore, SqliteDocstore):
+                docstore = SqliteDocstore.from_documents(docstore._dict.items())
+            docstore.save(path / DOCSTORE_FILE, self.db.index_to_docstore_id)
+        # БД без manifest сохраняется как есть, чтобы её docstore можно было конвертировать
+        if self.manifest is not None:
+            self.manifest.save(path / 'manifest.json')
+
+    def _save_pending(self, path: Path) -> None:
+        """Векторы в pending.npy, фрагменты в docstore: номер строки векторов служит id вектора."""
+        np.save(path / PENDING_VECTORS_FILE, np.array([chunk.embedding for chunk in self.pending], dtype=np.float32))
+        SqliteDocstore.from_documents(
+            (chunk.id, Document(page_content=chunk.text, metadata=chunk.metadata)) for chunk in self.pending
+        ).save(path / DOCSTORE_FILE, {i: chunk.id for i, chunk in enumerate(self.pending)})
+
+    @staticmethod
+    def _read_pending(path: Path) -> list[IndexedChunk]:
+        vectors = np.load(path / PENDING_VECTORS_FILE)
+        docstore = SqliteDocstore(path / DOCSTORE_FILE)
+        try:
+            chunks = []
+            for i, chunk_id in sorted(docstore.read_index_map().items()):
+                document = docstore.search(chunk_id)
+                chunks.append(IndexedChunk(
+                    id=chunk_id, text=document.page_content, metadata=document.metadata, embedding=vectors[i].tolist()
+                ))
+            return chunks
+        finally:
+            docstore.close()
+
+    def _remove_legacy_files(self) -> None:
+        """Файлы БД, сохранённой до появления версий."""
+        for file_name in self.db_files + (LEGACY_DOCSTORE_FILE,):
+            (self.db_path / file_name).unlink(missing_ok=True)
+
+    def _get_manifest(self) -> FaissManifest:
+        if self.manifest is None:
+            raise FaissManifestNotFoundError(str(self.db_path))
+        return self.manifest
+
+    def _acquire(self) -> FAISS:
+        """
+        Открывает БД для поиска, подхватывая новую опубликованную версию.
+        Ссылка на индекс остаётся валидной, даже если пул выгрузит БД или она будет перезагружена.
+        """
+        self.refresh()
+        if self.pool:
+            self.pool.acquire(self)
+        db = self.db
+        if db is None:
             raise FaissDBNotInitError()
-        return self.db.similarity_search(query=dto.query, k=dto.max_results)
+        return db
 
-    def get_db_path(self) -> Path:
-        return self.db_path
\ No newline at end of file
+    def _tune(self, db: FAISS, dto: VectorStoreQueryParams|VectorStoreBatchQueryParams) -> None:
+        if self.index_builder:
+            self.index_builder.tune(db.index, dto.nprobe, dto.ef_search)
+
+    def _query_vectors(self, db: FAISS, dto: VectorStoreBatchQueryParams) -> np.ndarray:
+        if dto.embeddings is not None:
+            vectors = dto.embeddings
+        elif hasattr(self.embeddings, 'embed_queries'):
+            vectors = self.embeddings.embed_queries(dto.queries)
+        else:
+            vectors = [self.embeddings.embed_query(query) for query in dto.queries]
+
+        vectors = np.array(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        if db._normalize_L2:
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _scored_results(
+            self,
+            db: FAISS,
+            query: np.ndarray,
+            hits: list[tuple[Document, float, int]],
+            with_vectors: bool,
+    ) -> list[VectorSearchResult]:
+        if not hits:
+            return []
+        exact = not self.index_info.lossy
+        if exact:
+            vectors = [
+                db.index.reconstruct(vector_id) if with_vectors or not db._normalize_L2 else None for _, _, vector_id in hits
+            ]
+        else:
+            vectors = np.array(
+                self.embeddings.embed_documents([document.page_content for document, _, _ in hits]), dtype=np.float32
+            ).reshape(len(hits), -1)
+            if db._normalize_L2:
+                faiss.normalize_L2(vectors)
+
+        results = []
+        query_norm = float(np.linalg.norm(query))
+        for (document, distance, _), vector in zip(hits, vectors):
+            if exact and db._normalize_L2:
+                similarity = 1 - distance / 2
+            else:
+                norm = query_norm * float(np.linalg.norm(vector))
+                similarity = float(np.dot(query, vector)) / norm if norm else 0.0
+            results.append(VectorSearchResult(
+                document=document,
+                distance=distance,
+                similarity=similarity,
+                embedding=vector.tolist() if with_vectors else None,
+            ))
+        return results
+
+    @staticmethod
+    def _filter_ids(db: FAISS, dto: VectorStoreBatchQueryParams) -> np.ndarray|None:
+        """id векторов, подходящих под фильтр запроса, None - без фильтра."""
+        if not dto.filter:
+            return None
+        docstore = db.docstore
+        if isinstance(docstore, SqliteDocstore) and not docstore.has_changes() and docstore.has_metadata_index():
+            return docstore.filter_ids(dto.filter)
+
+        # Несохранённые изменения и БД без индекса метаданных проверяются перебором
+        return np.array([
+            vector_id for vector_id, chunk_id in db.index_to_docstore_id.items()
+            if matches_filter(docstore.search(chunk_id), dto.filter)
+        ], dtype=np.int64)
+
+    @staticmethod
+    def _search_vectors(
+            db: FAISS,
+            vectors: np.ndarray,
+            k: int,
+            ids: np.ndarray|None = None,
+    ) -> list[list[tuple[Document, float, int]]]:
+        """Документы, L2 расстояния и id векторов в индексе. ids - ограничение поиска подмножеством векторов."""
+        if not len(vectors):
+            return []
+
+        scores, indices = db.index.search(vectors, k) if ids is None else filtered_search(db.index, vectors, k, ids)
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            hits = []
+            for score, i in zip(row_scores, row_indices):
+                # -1 - в индексе меньше k векторов
+                if i == -1:
+                    continue
+                document = db.docstore.search(db.index_to_docstore_id[int(i)])
+                if isinstance(document, Document):
+                    hits.append((document, float(score), int(i)))
+            results.append(hits)
+        return results
+
+    def _add_chunks(self, chunks: list[IndexedChunk]) -> None:
+        if not chunks:
+            return
+
+        self.embed_chunks(chunks)
+        if self.index_builder is None:
+            text_embeddings = [(chunk.text, chunk.embedding) for chunk in chunks]
+            metadatas = [chunk.metadata for chunk in chunks]
+            ids = [chunk.id for chunk in chunks]
+            if self.db is None:
+                self.db = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+                self.index_info = FaissIndexInfo.from_builder(None)
+            else:
+                self.db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+            return
+
+        if self.db is None and self.index_builder.needs_training():
+            self.pending.extend(chunks)
+            if len(self.pending) >= self.index_builder.train_size:
+                self._train()
+            return
+        if self.db is None:
+            self.db = self._empty_db(self.index_builder.build(len(chunks[0].embedding)))
+        self._add_with_ids(chunks)
+
+    def _train(self) -> None:
+        """Обучает индекс на накопленных векторах и добавляет их в него."""
+        vectors = np.array([chunk.embedding for chunk in self.pending], dtype=np.float32)
+        index = self.index_builder.build(vectors.shape[1])
+        self.index_builder.train(index, vectors)
+        self.db = self._empty_db(index)
+        chunks, self.pending = self.pending, []
+        self._add_with_ids(chunks)
+
+    def _apply_aliases(self) -> None:
+        """
+        aliases - полный набор алиасов после прохода дедупликации: у фрагментов вне набора алиасы удаляются,
+        например когда дубликат изменился или удалён.
+        """
+        docstore = self.db.docstore
+        if isinstance(docstore, SqliteDocstore):
+            stored = docstore.alias_ids()
+        else:
+            stored = {chunk_id for chunk_id, document in docstore._dict.items() if 'aliases' in document.metadata}
+
+        updated = {}
+        for chunk_id in stored | set(self.aliases):
+            document = docstore.search(chunk_id)
+            if not isinstance(document, Document):
+                continue
+            metadata = {key: value for key, value in document.metadata.items() if key != 'aliases'}
+            if self.aliases.get(chunk_id):
+                metadata['aliases'] = self.aliases[chunk_id]
+            if metadata != document.metadata:
+                updated[chunk_id] = Document(page_content=document.page_content, metadata=metadata)
+        docstore.delete(list(updated))
+        docstore.add(updated)
+
+    def _empty_db(self, index: faiss.Index|FaissBinaryIndex) -> FAISS:
+        self.next_id = 0
+        self.index_info = FaissIndexInfo.from_builder(self.index_builder)
+        return FAISS(self.embeddings, index, InMemoryDocstore(), {})
+
+    def _add_with_ids(self, chunks: list[IndexedChunk]) -> None:
+        """ANN индексы хранят собственные id векторов, поэтому они не сдвигаются при удалении."""
+        ids = np.arange(self.next_id, self.next_id + len(chunks), dtype=np.int64)
+        self.db.index.add_with_ids(np.array([chunk.embedding for chunk in chunks], dtype=np.float32), ids)
+        self.db.docstore.add({
+            chunk.id: Document(page_content=chunk.text, metadata=chunk.metadata) for chunk in chunks
+        })
+        self.db.index_to_docstore_id.update({int(i): chunk.id for i, chunk in zip(ids, chunks)})
+        self.next_id += len(chunks)
+
+    def _delete_chunks(self, chunk_ids: list[str]) -> None:
+        if not chunk_ids:
+            return
+        if self.pending:
+            removed = set(chunk_ids)
+            self.pending = [chunk for chunk in self.pending if chunk.id not in removed]
+        if self.db is None:
+            return
+        if self.index_builder is None:
+            self.db.delete(chunk_ids)
+            return
+        if not self.index_builder.supports_delete():
+            raise FaissIndexDeleteError(self.index_builder.description())
+
+        removed = set(chunk_ids)
+        ids = [i for i, chunk_id in self.db.index_to_docstore_id.items() if chunk_id in removed]
+        self.db.index.remove_ids(np.array(ids, dtype=np.int64))
+        self.db.docstore.delete([self.db.index_to_docstore_id.pop(i) for i in ids])
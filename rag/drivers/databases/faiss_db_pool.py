@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING
+from rag.utils.logger import logger
+
+if TYPE_CHECKING:
+    from rag.drivers.databases.faiss_db import FaissDB
+
+@dataclass
+class FaissDBPoolStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    loaded: int = 0
+    memory_bytes: int = 0
+
+class FaissDBPool:
+    """
+    Пул открытых векторных БД с бюджетом памяти.
+    При превышении бюджета выгружаются давно не использованные БД, открытые только для чтения;
+    при следующем поиске они прочитываются заново.
+    """
+    def __init__(self, memory_budget_mb: int) -> None:
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.entries: OrderedDict[int, tuple['FaissDB', int]] = OrderedDict()
+        self.stats = FaissDBPoolStats()
+        self._lock = threading.Lock()
+
+    def acquire(self, db: 'FaissDB') -> None:
+        """Отмечает использование БД и открывает её, если она была выгружена."""
+        with self._lock:
+            if id(db) in self.entries and db.is_loaded():
+                self.entries.move_to_end(id(db))
+                self.stats.hits += 1
+                return
+            self.stats.misses += 1
+        db.load()
+
+    def register(self, db: 'FaissDB') -> None:
+        with self._lock:
+            self.entries[id(db)] = (db, db.memory_usage())
+            self.entries.move_to_end(id(db))
+            victims = self._evict(keep=db)
+
+        # Выгрузка вне блокировки пула: unload берёт блокировку самой БД
+        for victim in victims:
+            logger().debug(f"Vector DB pool evicts {victim.get_db_path()}")
+            victim.unload()
+
+    def release(self, db: 'FaissDB') -> None:
+        with self._lock:
+            self.entries.pop(id(db), None)
+
+    def get_stats(self) -> FaissDBPoolStats:
+        with self._lock:
+            return replace(self.stats, loaded=len(self.entries), memory_bytes=self._usage())
+
+    def _evict(self, keep: 'FaissDB') -> list['FaissDB']:
+        victims = []
+        usage = self._usage()
+        for key, (db, size) in list(self.entries.items()):
+            if usage <= self.memory_budget:
+                break
+            if db is keep or not db.is_evictable():
+                continue
+            del self.entries[key]
+            usage -= size
+            victims.append(db)
+            self.stats.evictions += 1
+        return victims
+
+    def _usage(self) -> int:
+        return sum(size for _, size in self.entries.values())
@@ -0,0 +1,311 @@
+import json
+import os
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import faiss
+import numpy as np
+from rag.drivers.databases.faiss_binary import FaissBinaryIndex, DEFAULT_RESCORE
+
+INDEX_TYPES: tuple[str, ...] = ('flat', 'ivf', 'hnsw', 'sq', 'pq', 'binary')
+SQ_TYPES: dict[str, str] = {'8': 'SQ8', '6': 'SQ6', '4': 'SQ4', 'fp16': 'SQfp16'}
+# Понижение размерности перед индексом: PCA обучается на векторах, случайная проекция - ортонормированная матрица
+TRANSFORM_TYPES: dict[str, str] = {'pca': 'PCA', 'random': 'RR'}
+# faiss предупреждает, если на кластер приходится меньше 39 обучающих векторов
+TRAIN_POINTS_PER_CENTROID: int = 39
+DEFAULT_TRAIN_SIZE: int = 10000
+# Выборки до этого размера при фильтрации перебираются точно: это дешевле обхода индекса
+# и не теряет результаты, которых нет в просмотренных кластерах IVF или в окрестности графа HNSW
+BRUTE_FORCE_FILTER_SIZE: int = 4096
+# faiss < 1.7.3 не поддерживает фильтрацию id во время поиска, тогда результаты фильтруются после поиска с запасом
+SUPPORTS_ID_SELECTOR: bool = hasattr(faiss, 'SearchParameters')
+INDEX_INFO_FILE: str = 'index.json'
+
+class FaissIndexTypeError(Exception):
+    def __init__(self, index_type: str) -> None:
+        super().__init__(f"Undefined faiss index type: '{index_type}', available: {', '.join(INDEX_TYPES)}")
+
+class FaissTransformTypeError(Exception):
+    def __init__(self, transform: str) -> None:
+        super().__init__(f"Undefined faiss transform: '{transform}', available: {', '.join(TRANSFORM_TYPES)}")
+
+class FaissTransformNotSupportedError(Exception):
+    def __init__(self, index_type: str) -> None:
+        super().__init__(f"Faiss index type '{index_type}' does not support vector transforms")
+
+class FaissIndexTrainError(Exception):
+    def __init__(self, description: str, vectors: int, required: int) -> None:
+        super().__init__(f"Not enough vectors to train faiss index {description}: {vectors}, required {required}")
+
+class FaissIndexDeleteError(Exception):
+    def __init__(self, description: str) -> None:
+        super().__init__(f"Faiss index {description} does not support deletion, recreate the DB")
+
+class FaissIndexBuilder:
+    """
+    Строит ANN индекс faiss по конфигурации из faiss_factory.yaml:
+        flat - точный поиск
+        ivf  - nlist кластеров, при поиске просматривается nprobe; encoding: flat|sq8|sq4|sqfp16|pq
+        hnsw - граф с M связями, ef_construction при построении и ef_search при поиске
+        sq   - скалярное квантование bits: 8|6|4|fp16
+        pq   - произведение квантований на pq_m подвекторов по pq_nbits бит
+        binary - знаковые биты векторов с пересчётом k * rescore кандидатов по полным векторам, см. FaissBinaryIndex
+    transform: pca|random понижает размерность векторов до transform_dim перед любым из индексов,
+    матрица сохраняется в index.faiss и применяется к векторам запросов при поиске.
+    Все индексы, кроме ivf, оборачиваются в IDMap2, чтобы id векторов не менялись при удалении.
+    """
+    def __init__(
+            self,
+            type: str = 'flat',
+            nlist: int = 1024,
+            nprobe: int = 8,
+            m: int = 32,
+            ef_construction: int = 40,
+            ef_search: int = 16,
+            bits: str|int = 8,
+            pq_m: int = 16,
+            pq_nbits: int = 8,
+            encoding: str = 'flat',
+            train_size: int|None = None,
+            transform: str|None = None,
+            transform_dim: int = 256,
+            rescore: int = DEFAULT_RESCORE,
+    ) -> None:
+        if type not in INDEX_TYPES:
+            raise FaissIndexTypeError(type)
+        if transform is not None and transform not in TRANSFORM_TYPES:
+            raise FaissTransformTypeError(transform)
+        if transform is not None and type == 'binary':
+            raise FaissTransformNotSupportedError(type)
+        self.type = type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.bits = str(bits)
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.encoding = encoding
+        self.transform = transform
+        self.transform_dim = transform_dim
+        self.rescore = rescore
+        self.train_size = train_size or max(self.min_train_size() * TRAIN_POINTS_PER_CENTROID, DEFAULT_TRAIN_SIZE)
+
+    def description(self) -> str:
+        transform = f"{TRANSFORM_TYPES[self.transform]}{self.transform_dim}," if self.transform else ''
+        if self.type == 'ivf':
+            return f"{transform}IVF{self.nlist},{self._encoding()}"
+        if self.type == 'hnsw':
+            return f"IDMap2,{transform}HNSW{self.m},Flat"
+        if self.type == 'sq':
+            return f"IDMap2,{transform}{SQ_TYPES.get(self.bits, 'SQ8')}"
+        if self.type == 'pq':
+            return f"IDMap2,{transform}PQ{self.pq_m}x{self.pq_nbits}"
+        if self.type == 'binary':
+            return f"BIDMap2,BFlat,Rescore{self.rescore}"
+        return f"IDMap2,{transform}Flat"
+
+    def build(self, dim: int) -> faiss.Index|FaissBinaryIndex:
+        if self.type == 'binary':
+            return FaissBinaryIndex(dim, self.rescore)
+        index = faiss.index_factory(dim, self.description(), faiss.METRIC_L2)
+        if self.type == 'ivf':
+            # Прямая карта id -> позиция нужна для удаления и восстановления векторов по id
+            faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+        if self.type == 'hnsw':
+            base_index(index).hnsw.efConstruction = self.ef_construction
+        self.tune(index)
+        return index
+
+    def train(self, index: faiss.Index, vectors: np.ndarray) -> None:
+        if index.is_trained:
+            return
+        required = self.min_train_size()
+        if len(vectors) < required:
+            raise FaissIndexTrainError(self.description(), len(vectors), required)
+        index.train(vectors)
+
+    def needs_training(self) -> bool:
+        return self.type in ('ivf', 'sq', 'pq') or self.transform is not None
+
+    def min_train_size(self) -> int:
+        # PCA оценивает transform_dim главных компонент
+        transform = self.transform_dim if self.transform == 'pca' else 1
+        if self.type == 'ivf':
+            return max(self.nlist, 2 ** self.pq_nbits if self.encoding == 'pq' else 1, transform)
+        if self.type == 'pq':
+            return max(2 ** self.pq_nbits, transform)
+        return transform
+
+    def supports_delete(self) -> bool:
+        return self.type != 'hnsw'
+
+    def to_config(self) -> dict:
+        """Параметры, из которых FaissIndexBuilder строится заново, см. FaissIndexInfo."""
+        return {
+            'type': self.type,
+            'nlist': self.nlist,
+            'nprobe': self.nprobe,
+            'm': self.m,
+            'ef_construction': self.ef_construction,
+            'ef_search': self.ef_search,
+            'bits': self.bits,
+            'pq_m': self.pq_m,
+            'pq_nbits': self.pq_nbits,
+            'encoding': self.encoding,
+            'train_size': self.train_size,
+            'transform': self.transform,
+            'transform_dim': self.transform_dim,
+            'rescore': self.rescore,
+        }
+
+    def is_lossy(self) -> bool:
+        """Индекс хранит приближённые векторы: восстановленные векторы и расстояния отличаются от точных."""
+        return self.transform is not None or self.type in ('sq', 'pq') or (self.type == 'ivf' and self.encoding != 'flat')
+
+    def supports_mmap(self) -> bool:
+        """faiss читает через mmap только инвертированные списки IVF, остальные индексы копируются в память."""
+        return self.type == 'ivf'
+
+    def tune(self, index: faiss.Index|FaissBinaryIndex, nprobe: int|None = None, ef_search: int|None = None) -> None:
+        """Параметры поиска: явно переданные в запросе или значения из конфигурации."""
+        if isinstance(index, FaissBinaryIndex):
+            index.rescore = self.rescore
+        elif self.type == 'ivf':
+            faiss.ParameterSpace().set_index_parameter(index, 'nprobe', nprobe or self.nprobe)
+        elif self.type == 'hnsw':
+            faiss.ParameterSpace().set_index_parameter(index, 'efSearch', ef_search or self.ef_search)
+
+    def _encoding(self) -> str:
+        if self.encoding == 'pq':
+            return f"PQ{self.pq_m}x{self.pq_nbits}"
+        if self.encoding.startswith('sq'):
+            return SQ_TYPES.get(self.encoding.removeprefix('sq'), 'SQ8')
+        return 'Flat'
+
+@dataclass
+class FaissIndexInfo:
+    """
+    Тип индекса, сохраняемый рядом с index.faiss: БД может быть открыта без конфигурации индекса,
+    например VectorDatabaseService открывает все БД из директории databases.
+    """
+    config: dict
+    # Индекс хранит приближённые векторы, см. FaissIndexBuilder.is_lossy
+    lossy: bool = False
+    # Индекс читается через mmap, см. FaissIndexBuilder.supports_mmap
+    mmap: bool = False
+
+    @classmethod
+    def from_builder(cls, builder: FaissIndexBuilder|None) -> 'FaissIndexInfo':
+        if builder is None:
+            return cls({'type': 'flat'})
+        return cls(builder.to_config(), builder.is_lossy(), builder.supports_mmap())
+
+    @classmethod
+    def load(cls, path: Path) -> 'FaissIndexInfo':
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(**json.load(file))
+
+    def save(self, path: Path) -> None:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(asdict(self), file)
+            file.flush()
+            os.fsync(file.fileno())
+
+def filtered_search(
+        index: faiss.Index|FaissBinaryIndex,
+        vectors: np.ndarray,
+        k: int,
+        ids: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Поиск k ближайших только среди векторов с заданными id, результат в формате index.search."""
+    if len(ids) <= BRUTE_FORCE_FILTER_SIZE:
+        return _brute_force_search(index, vectors, k, ids)
+    if isinstance(index, FaissBinaryIndex):
+        return index.search(vectors, k, ids)
+    if not SUPPORTS_ID_SELECTOR:
+        return _post_filter_search(index, vectors, k, ids)
+
+    try:
+        if not isinstance(index, faiss.IndexIDMap):
+            return index.search(vectors, k, params=_search_parameters(index, faiss.IDSelectorBatch(ids)))
+
+        # IDMap не принимает параметры поиска: фильтр переводится в позиции вложенного индекса
+        id_map = faiss.rev_swig_ptr(index.id_map.data(), index.id_map.size())
+        positions = id_map_positions(id_map, ids)
+        inner = faiss.downcast_index(index.index)
+        distances, labels = inner.search(vectors, k, params=_search_parameters(inner, faiss.IDSelectorBatch(positions)))
+        return distances, np.where(labels >= 0, id_map[labels], -1)
+    except RuntimeError:
+        # Индексы без поддержки селектора, например IVF без прямой карты
+        return _post_filter_search(index, vectors, k, ids)
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """Индекс под обёртками IDMap и преобразованиями векторов."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexPreTransform)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+def _search_parameters(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """
+    Параметры поиска с селектором id, текущие nprobe и efSearch индекса сохраняются.
+    IndexPreTransform передаёт параметры вложенному индексу, поэтому их тип определяется по нему.
+    """
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    if isinstance(base, faiss.IndexPQ):
+        return faiss.SearchParametersPQ(sel=selector)
+    return faiss.SearchParameters(sel=selector)
+
+def id_map_positions(id_map: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    # id выдаются по возрастанию, а удаление сохраняет порядок, поэтому id_map отсортирован
+    positions = np.searchsorted(id_map, ids).clip(max=len(id_map) - 1)
+    if np.array_equal(id_map[positions], ids):
+        return positions
+    return np.flatnonzero(np.isin(id_map, ids))
+
+def _post_filter_search(index: faiss.Index, vectors: np.ndarray, k: int, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Поиск без селектора id: из результатов поиска с запасом остаются векторы выборки.
+    Запас рассчитан на долю выборки в индексе и удваивается, пока каждый запрос не наберёт k результатов
+    или поиск не охватит весь индекс.
+    """
+    distances = np.full((len(vectors), k), np.inf, dtype=np.float32)
+    labels = np.full((len(vectors), k), -1, dtype=np.int64)
+    if not len(ids) or not index.ntotal:
+        return distances, labels
+
+    fetch = min(index.ntotal, 2 * k * -(-index.ntotal // len(ids)))
+    while True:
+        found_distances, found_labels = index.search(vectors, fetch)
+        selected = np.isin(found_labels, ids)
+        if fetch >= index.ntotal or (selected.sum(axis=1) >= k).all():
+            break
+        fetch = min(index.ntotal, fetch * 2)
+
+    for row in range(len(vectors)):
+        hits = np.flatnonzero(selected[row])[:k]
+        distances[row, :len(hits)] = found_distances[row, hits]
+        labels[row, :len(hits)] = found_labels[row, hits]
+    return distances, labels
+
+def _brute_force_search(index: faiss.Index, vectors: np.ndarray, k: int, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Точные L2 расстояния до восстановленных из индекса векторов выборки."""
+    distances = np.full((len(vectors), k), np.inf, dtype=np.float32)
+    labels = np.full((len(vectors), k), -1, dtype=np.int64)
+    if not len(ids):
+        return distances, labels
+
+    candidates = index.reconstruct_batch(ids)
+    scores = (
+        (vectors ** 2).sum(axis=1)[:, None] + (candidates ** 2).sum(axis=1)[None, :] - 2 * vectors @ candidates.T
+    )
+    top = min(k, len(ids))
+    order = np.argsort(scores, axis=1)[:, :top]
+    distances[:, :top] = np.take_along_axis(scores, order, axis=1)
+    labels[:, :top] = ids[order]
+    return distances, labels
@@ -0,0 +1,43 @@
+import json
+import os
+from pathlib import Path
+
+class FaissManifest:
+    """Соответствие id документа -> хеш содержимого и id его фрагментов в индексе."""
+    def __init__(self, items: dict[str, dict] = None) -> None:
+        if items is None:
+            items = {}
+        self.items = items
+
+    @classmethod
+    def load(cls, path: Path) -> 'FaissManifest':
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def save(self, path: Path) -> None:
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.items, file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+
+    def get_hash(self, document_id: str) -> str|None:
+        item = self.items.get(document_id)
+        return item['hash'] if item else None
+
+    def chunk_ids(self, document_id: str) -> list[str]:
+        item = self.items.get(document_id)
+        return item['chunks'] if item else []
+
+    def put(self, document_id: str, document_hash: str, chunk_ids: list[str]) -> None:
+        self.items[document_id] = {'hash': document_hash, 'chunks': chunk_ids}
+
+    def remove(self, document_id: str) -> None:
+        self.items.pop(document_id, None)
+
+    def document_ids(self) -> set[str]:
+        return set(self.items.keys())
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self.items
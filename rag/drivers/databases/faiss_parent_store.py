@@ -0,0 +1,23 @@
+import json
+from pathlib import Path
+
+PARENTS_FILE: str = 'parents.json'
+
+class FaissParentStore:
+    """
+    Тексты родительских фрагментов из parents.json: id документа -> гранулярность -> фрагменты.
+    Файл остаётся только у БД, сохранённых до переноса родителей в docstore, и читается целиком.
+    """
+    def __init__(self, items: dict[str, dict[str, list[str]]] = None) -> None:
+        if items is None:
+            items = {}
+        self.items = items
+
+    @classmethod
+    def load(cls, path: Path) -> 'FaissParentStore':
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def get(self, document_id: str, granularity: str, index: int) -> str|None:
+        parents = self.items.get(document_id, {}).get(granularity, [])
+        return parents[index] if 0 <= index < len(parents) else None
@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+CURRENT_FILE: str = 'CURRENT'
+VERSIONS_DIR: str = 'versions'
+SHARDS_FILE: str = 'shards.json'
+# Предыдущая версия остаётся на диске для процессов, которые ещё читают её
+KEEP_VERSIONS: int = 2
+
+class FaissVersionStore:
+    """
+    Версии БД: каждое сохранение пишется в новую директорию db_path/versions/<версия>,
+    которая публикуется атомарным rename, после чего атомарно подменяется файл CURRENT с именем версии.
+    Читатель видит либо старую, либо новую версию целиком, но не частично записанные файлы.
+    БД без CURRENT хранит файлы прямо в db_path.
+    """
+    def __init__(self, db_path: Path, keep: int = KEEP_VERSIONS) -> None:
+        self.db_path = db_path
+        self.versions_path = db_path / VERSIONS_DIR
+        self.current_file = db_path / CURRENT_FILE
+        self.keep = keep
+
+    def current(self) -> str|None:
+        try:
+            return self.current_file.read_text(encoding='utf-8').strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current_path(self) -> Path:
+        version = self.current()
+        return self.versions_path / version if version else self.db_path
+
+    def stamp(self) -> tuple[int, int]|None:
+        """Отпечаток CURRENT: меняется при каждой публикации, проверка стоит один stat."""
+        try:
+            stat = self.current_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def prepare(self) -> Path:
+        """Временная директория для записи новой версии рядом с версиями, чтобы rename был атомарным."""
+        tmp_path = self.versions_path / '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        return tmp_path
+
+    def publish(self, tmp_path: Path) -> Path:
+        version = self._next_version()
+        path = self.versions_path / version
+        os.rename(tmp_path, path)
+
+        tmp_current = self.db_path / f".{CURRENT_FILE}.tmp"
+        with open(tmp_current, 'w', encoding='utf-8') as file:
+            file.write(version)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_current, self.current_file)
+        self.prune()
+        return path
+
+    def prune(self) -> None:
+        current = self.current()
+        versions = sorted(path.name for path in self.versions_path.iterdir() if not path.name.startswith('.'))
+        for version in versions[:-self.keep]:
+            if version != current:
+                shutil.rmtree(self.versions_path / version, ignore_errors=True)
+
+    def clear(self) -> None:
+        self.current_file.unlink(missing_ok=True)
+        shutil.rmtree(self.versions_path, ignore_errors=True)
+
+    def _next_version(self) -> str:
+        # Имена сортируются в порядке публикации
+        version = f"{time.time_ns():020d}"
+        current = self.current()
+        if current is not None and version <= current:
+            version = f"{int(current) + 1:020d}"
+        return version
+
+
+class FaissShardSetVersionStore(FaissVersionStore):
+    """
+    Общие версии шардов ShardedFaissDB: версия - файл shards.json с числом шардов и версией каждого из них.
+    Шарды записывают свои версии, не публикуя их, а затем один раз подменяется общий CURRENT:
+    читатели видят изменения всех шардов одновременно, а прерванная запись не видна ни в одном шарде.
+    """
+    def __init__(self, db_path: Path, keep: int = KEEP_VERSIONS) -> None:
+        super().__init__(db_path, keep)
+        self._cache: tuple[tuple[int, int]|None, dict] = (None, {})
+
+    def manifest(self) -> dict|None:
+        """Содержимое shards.json текущей версии, None - общих версий ещё нет."""
+        stamp = self.stamp()
+        if stamp is None:
+            return None
+        cached_stamp, manifest = self._cache
+        if cached_stamp != stamp:
+            with open(self.current_path() / SHARDS_FILE, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+            self._cache = (stamp, manifest)
+        return manifest
+
+    def shard_versions(self) -> dict[str, str]|None:
+        manifest = self.manifest()
+        return None if manifest is None else manifest['versions']
+
+    def publish_shards(self, shards: int, versions: dict[str, str]) -> None:
+        tmp_path = self.prepare()
+        try:
+            with open(tmp_path / SHARDS_FILE, 'w', encoding='utf-8') as file:
+                json.dump({'shards': shards, 'versions': versions}, file)
+                file.flush()
+                os.fsync(file.fileno())
+            self.publish(tmp_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+    def referenced(self, shard: str) -> set[str]:
+        """Версии шарда во всех оставленных общих версиях: их ещё могут читать другие процессы."""
+        if not self.versions_path.is_dir():
+            return set()
+        versions = set()
+        for path in self.versions_path.iterdir():
+            if path.name.startswith('.'):
+                continue
+            try:
+                with open(path / SHARDS_FILE, 'r', encoding='utf-8') as file:
+                    version = json.load(file)['versions'].get(shard)
+            except FileNotFoundError:
+                continue
+            if version:
+                versions.add(version)
+        return versions
+
+class FaissShardVersionStore(FaissVersionStore):
+    """
+    Версии шарда: publish только записывает версию, видимой её делает общая версия шардов, см. FaissShardSetVersionStore.
+    Шард, сохранённый до появления общих версий, читается по своему CURRENT.
+    """
+    def __init__(self, db_path: Path, shards: FaissShardSetVersionStore, keep: int = KEEP_VERSIONS) -> None:
+        super().__init__(db_path, keep)
+        self.shards = shards
+        self.shard = db_path.name
+        # Записанная, но ещё не опубликованная версия
+        self.staged: str|None = None
+
+    def current(self) -> str|None:
+        versions = self.shards.shard_versions()
+        return super().current() if versions is None else versions.get(self.shard)
+
+    def stamp(self) -> tuple[int, int]|None:
+        return self.shards.stamp()
+
+    def latest(self) -> str|None:
+        """Версия шарда для следующей общей версии."""
+        return self.staged or self.current()
+
+    def publish(self, tmp_path: Path) -> Path:
+        version = self._next_version()
+        path = self.versions_path / version
+        os.rename(tmp_path, path)
+        self.staged = version
+        return path
+
+    def prune(self) -> None:
+        """Вызывается после публикации общей версии: собственный CURRENT шарда больше не читается."""
+        self.current_file.unlink(missing_ok=True)
+        if not self.versions_path.is_dir():
+            return
+        keep = self.shards.referenced(self.shard) | {self.staged, self.current()}
+        for path in self.versions_path.iterdir():
+            if not path.name.startswith('.') and path.name not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def clear(self) -> None:
+        super().clear()
+        self.staged = None
+
+    def _next_version(self) -> str:
+        version = super()._next_version()
+        if self.staged is not None and version <= self.staged:
+            version = f"{int(self.staged) + 1:020d}"
+        return version
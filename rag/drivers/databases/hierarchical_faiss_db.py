@@ -0,0 +1,185 @@
+from pathlib import Path
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain.schema import Document
+from rag.drivers.databases.faiss_db import FaissDB, DB_FILES
+from rag.drivers.databases.faiss_db_pool import FaissDBPool
+from rag.drivers.databases.faiss_parent_store import FaissParentStore, PARENTS_FILE
+from rag.drivers.databases.sqlite_docstore import SqliteDocstore, DOCSTORE_FILE, has_table
+from rag.entities.index import IndexedDocument
+from rag.entities.vector_store import VectorStoreQueryParams, VectorStoreBatchQueryParams, VectorSearchResult
+
+HIERARCHICAL_DB_FILES: tuple[str, ...] = DB_FILES + (PARENTS_FILE,)
+
+class FaissGranularityNotFoundError(Exception):
+    def __init__(self, db_path: str, granularity: str) -> None:
+        super().__init__(f"DB {db_path} has no granularity '{granularity}'")
+
+class HierarchicalFaissDB(FaissDB):
+    """
+    Иерархический индекс: эмбеддятся только мелкие фрагменты, каждый ссылается на своих родителей крупных гранулярностей.
+    Поиск по крупной гранулярности ищет мелкие фрагменты и возвращает уникальных родителей в порядке релевантности.
+    Тексты родителей хранятся в docstore и читаются по одному для найденных фрагментов.
+    """
+    db_files: tuple[str, ...] = HIERARCHICAL_DB_FILES
+
+    def __init__(
+            self,
+            db_path: Path|str,
+            embeddings: Embeddings,
+            granularity: str,
+            overfetch: int = 4,
+            index: dict|None = None,
+            pool: FaissDBPool|None = None,
+    ) -> None:
+        super().__init__(db_path, embeddings, index, pool)
+        self.granularity = granularity
+        self.overfetch = overfetch
+        # Несохранённые родители документов: id документа -> гранулярность -> фрагменты, None - документ удалён
+        self.parent_changes: dict[str, dict[str, list[str]]|None] = {}
+        self._legacy_parents = None
+
+    @property
+    def legacy_parents(self) -> FaissParentStore:
+        """Родители из parents.json БД, сохранённой до переноса родителей в docstore."""
+        if self._legacy_parents is None:
+            with self._lock:
+                if self._legacy_parents is None:
+                    parents_file = self.data_path / PARENTS_FILE
+                    self._legacy_parents = FaissParentStore.load(parents_file) if parents_file.exists() else FaissParentStore()
+        return self._legacy_parents
+
+    def unload(self) -> None:
+        super().unload()
+        self._legacy_parents = None
+
+    def is_evictable(self) -> bool:
+        return super().is_evictable() and not self.parent_changes
+
+    def upsert(self, documents: list[IndexedDocument]) -> list[IndexedDocument]:
+        changed = super().upsert(documents)
+        for document in changed:
+            self.parent_changes[document.id] = document.parents
+        return changed
+
+    def delete(self, ids: list[str]) -> None:
+        super().delete(ids)
+        for document_id in ids:
+            self.parent_changes[document_id] = None
+
+    def save(self) -> None:
+        super().save()
+        self.parent_changes = {}
+        self._legacy_parents = None
+
+    def discard(self) -> None:
+        super().discard()
+        self.parent_changes = {}
+
+    def delete_db(self) -> None:
+        super().delete_db()
+        self.parent_changes = {}
+        self._legacy_parents = None
+
+    def search(self, dto: VectorStoreQueryParams) -> list[Document]:
+        if dto.granularity is None or dto.granularity == self.granularity or dto.filter:
+            return super().search(dto)
+
+        db = self._acquire()
+        self._tune(db, dto)
+        k = dto.max_results * self.overfetch
+        if dto.embedding is not None:
+            chunks = db.similarity_search_by_vector(dto.embedding, k=k)
+        else:
+            chunks = db.similarity_search(query=dto.query, k=k)
+        return self._parent_documents(db, chunks, dto.granularity, dto.max_results)
+
+    def search_batch(self, dto: VectorStoreBatchQueryParams) -> list[list[Document]]:
+        if dto.granularity is None or dto.granularity == self.granularity:
+            return super().search_batch(dto)
+
+        db = self._acquire()
+        self._tune(db, dto)
+        return [
+            self._parent_documents(db, [chunk for chunk, _, _ in hits], dto.granularity, dto.max_results)
+            for hits in self._search_vectors(
+                db, self._query_vectors(db, dto), dto.max_results * self.overfetch, self._filter_ids(db, dto)
+            )
+        ]
+
+    def search_batch_with_scores(self, dto: VectorStoreBatchQueryParams) -> list[list[VectorSearchResult]]:
+        if dto.granularity is None or dto.granularity == self.granularity:
+            return super().search_batch_with_scores(dto)
+
+        db = self._acquire()
+        self._tune(db, dto)
+        vectors = self._query_vectors(db, dto)
+        return [
+            self._parent_results(db, self._scored_results(db, vector, hits, dto.with_vectors), dto.granularity, dto.max_results)
+            for vector, hits in zip(
+                vectors, self._search_vectors(db, vectors, dto.max_results * self.overfetch, self._filter_ids(db, dto))
+            )
+        ]
+
+    def search_lexical(self, dto: VectorStoreQueryParams) -> list[VectorSearchResult]:
+        if dto.granularity is None or dto.granularity == self.granularity:
+            return super().search_lexical(dto)
+
+        chunks = super().search_lexical(dto.model_copy(update={'max_results': dto.max_results * self.overfetch}))
+        return self._parent_results(self._acquire(), chunks, dto.granularity, dto.max_results)
+
+    def _parent_documents(self, db: FAISS, chunks: list[Document], granularity: str, max_results: int) -> list[Document]:
+        results = [VectorSearchResult(document=chunk, distance=0.0) for chunk in chunks]
+        return [result.document for result in self._parent_results(db, results, granularity, max_results)]
+
+    def _parent_results(
+            self,
+            db: FAISS,
+            results: list[VectorSearchResult],
+            granularity: str,
+            max_results: int
+    ) -> list[VectorSearchResult]:
+        """Уникальные родители найденных фрагментов в порядке релевантности с оценками лучшего из их фрагментов."""
+        documents = []
+        seen = set()
+        for result in results:
+            chunk = result.document
+            parents = chunk.metadata.get('parents', {})
+            if granularity not in parents:
+                raise FaissGranularityNotFoundError(str(self.db_path), granularity)
+            key = (chunk.metadata['document_id'], parents[granularity])
+            if key in seen:
+                continue
+            seen.add(key)
+            text = self._parent_text(db, key[0], granularity, key[1])
+            if text is None:
+                continue
+
+            metadata = {name: value for name, value in chunk.metadata.items() if name != 'parents'}
+            document = Document(page_content=text, metadata={**metadata, 'granularity': granularity})
+            documents.append(result.model_copy(update={'document': document}))
+            if len(documents) >= max_results:
+                break
+        return documents
+
+    def _parent_text(self, db: FAISS, document_id: str, granularity: str, position: int) -> str|None:
+        if document_id in self.parent_changes:
+            parents = (self.parent_changes[document_id] or {}).get(granularity, [])
+            return parents[position] if 0 <= position < len(parents) else None
+        if isinstance(db.docstore, SqliteDocstore) and db.docstore.has_parents():
+            return db.docstore.parent(document_id, granularity, position)
+        return self.legacy_parents.get(document_id, granularity, position)
+
+    def _save_files(self, path: Path) -> None:
+        super()._save_files(path)
+        parents = self.parent_changes
+        source = self.data_path / DOCSTORE_FILE
+        docstore = self.db.docstore if self.db is not None else None
+        if not has_table(source, 'parents'):
+            # Родители из parents.json переносятся в docstore один раз, при первом сохранении
+            parents = {**self.legacy_parents.items, **parents}
+            source = None
+        elif isinstance(docstore, SqliteDocstore) and docstore.path == source:
+            # Файл скопирован из docstore предыдущей версии вместе с родителями
+            source = None
+        SqliteDocstore.save_parents(path / DOCSTORE_FILE, parents, source)
@@ -0,0 +1,229 @@
+import heapq
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, TypeVar
+from langchain_core.embeddings import Embeddings
+from langchain.schema import Document
+from rag.contracts.index_db import IndexDBContract
+from rag.contracts.lexical_search import LexicalSearchContract
+from rag.contracts.vector_store import VectorStoreContract
+from rag.drivers.databases.faiss_db import FaissDB, FaissDBExistError
+from rag.drivers.databases.faiss_db_pool import FaissDBPool
+from rag.drivers.databases.faiss_versions import FaissShardSetVersionStore, FaissShardVersionStore
+from rag.drivers.databases.snapshot_archive import SnapshotArchive, SnapshotStats
+from rag.entities.index import IndexedDocument, IndexedChunk, IndexSyncResult
+from rag.entities.vector_store import VectorStoreQueryParams, VectorStoreBatchQueryParams, VectorSearchResult
+from rag.utils.hash import text_digest
+from rag.utils.path import absolute_path
+
+SHARD_DIR_PREFIX: str = 'shard_'
+
+T = TypeVar('T')
+
+class ShardedFaissDB(VectorStoreContract, IndexDBContract, LexicalSearchContract):
+    """
+    Векторная БД из N независимых FAISS шардов: документ попадает в шард по хешу своего id.
+    Шарды индексируются и опрашиваются параллельно, результаты сливаются в точный общий top-k.
+    Версии шардов публикуются одной общей версией, см. FaissShardSetVersionStore.
+    """
+    def __init__(
+            self,
+            db_path: Path|str,
+            embeddings: Embeddings,
+            shards: int,
+            index: dict|None = None,
+            pool: FaissDBPool|None = None,
+            workers: int|None = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.db_path = absolute_path(db_path)
+        self.versions = FaissShardSetVersionStore(self.db_path)
+        self.shards = [
+            FaissDB(
+                shard_path, embeddings, index, pool,
+                versions=FaissShardVersionStore(shard_path, self.versions),
+            )
+            for shard_path in (self.db_path / f"{SHARD_DIR_PREFIX}{i}" for i in range(shards))
+        ]
+        self.workers = workers or shards
+        self._executor = None
+
+    def create_db(self, documents: list[IndexedDocument]) -> None:
+        if self.exists():
+            raise FaissDBExistError(str(self.db_path))
+        self.sync(documents)
+
+    @staticmethod
+    def shard_count(db_path: Path) -> int|None:
+        """Число шардов БД на диске, None - в db_path нет шардированной БД."""
+        manifest = FaissShardSetVersionStore(db_path).manifest()
+        if manifest is not None:
+            return manifest['shards']
+        # БД, сохранённая до появления общих версий, создавала директории всех шардов
+        shards = len(list(db_path.glob(f"{SHARD_DIR_PREFIX}*")))
+        return shards or None
+
+    def sync(self, documents: list[IndexedDocument]) -> IndexSyncResult:
+        """
+        Синхронизирует шарды, получившие документы или уже созданные: пустой шард без БД пропускается.
+        Шарды публикуются вместе, при ошибке в любом из них на диске остаётся прежняя версия всех шардов.
+        """
+        partitions = self._partition(documents, lambda document: document.id)
+        shards = [i for i, shard in enumerate(self.shards) if i in partitions or self._has_data(shard)]
+        result = IndexSyncResult()
+        for shard_result in self._write(lambda i: self.shards[i].sync(partitions.get(i, [])), shards):
+            result.added += shard_result.added
+            result.updated += shard_result.updated
+            result.deleted += shard_result.deleted
+            result.unchanged += shard_result.unchanged
+        return result
+
+    def upsert(self, documents: list[IndexedDocument]) -> list[IndexedDocument]:
+        partitions = self._partition(documents, lambda document: document.id)
+        changed = self._map(lambda i: self.shards[i].upsert(partitions[i]), partitions)
+        return [document for documents in changed for document in documents]
+
+    def delete(self, ids: list[str]) -> None:
+        partitions = self._partition(ids, lambda document_id: document_id)
+        self._map(lambda i: self.shards[i].delete(partitions[i]), partitions)
+
+    def update_aliases(self, aliases: dict[str, list[dict]]) -> None:
+        # id фрагмента имеет вид <id документа>#<номер>, см. IndexDocumentService
+        partitions = self._partition(aliases.items(), lambda item: item[0].rsplit('#', 1)[0])
+        # Набор алиасов полный: шард без алиасов удалит устаревшие
+        for i, shard in enumerate(self.shards):
+            shard.update_aliases(dict(partitions.get(i, [])))
+
+    def document_ids(self) -> set[str]:
+        return set().union(*(shard.document_ids() for shard in self.shards))
+
+    def document_hash(self, document_id: str) -> str|None:
+        return self._shard(document_id).document_hash(document_id)
+
+    def embed_chunks(self, chunks: list[IndexedChunk]) -> None:
+        self.shards[0].embed_chunks(chunks)
+
+    def exists(self) -> bool:
+        return any(shard.exists() for shard in self.shards)
+
+    def save(self) -> None:
+        self._write(lambda shard: shard.save(), [
+            shard for shard in self.shards
+            if shard.is_loaded() or shard.pending or (shard.aliases is not None and shard.exists())
+        ])
+
+    def checkpoint(self) -> None:
+        self._write(lambda shard: shard.checkpoint(), [shard for shard in self.shards if shard.is_loaded() or shard.pending])
+
+    def discard(self) -> None:
+        """Отбрасывает несохранённые изменения и записанные, но не опубликованные версии шардов."""
+        for shard in self.shards:
+            shard.discard()
+            shard.versions.staged = None
+
+    def import_snapshots(self, archives: dict[int, Path], snapshots: SnapshotArchive|None = None) -> dict[int, SnapshotStats]:
+        """Распаковывает снимки шардов и публикует их одной общей версией, шарды без снимка остаются пустыми."""
+        self.discard()
+        try:
+            stats = self._map(lambda i: self.shards[i].import_snapshot(archives[i], snapshots), archives)
+        except Exception:
+            self.discard()
+            raise
+        self._publish({shard.versions.shard: shard.versions.staged for shard in self.shards if shard.versions.staged})
+        return dict(zip(archives, stats))
+
+    def delete_db(self) -> None:
+        for shard in self.shards:
+            if shard.exists():
+                shard.delete_db()
+        self.versions.clear()
+
+    def unload(self) -> None:
+        for shard in self.shards:
+            shard.unload()
+
+    def search(self, dto: VectorStoreQueryParams) -> list[Document]:
+        return [result.document for result in self.search_with_scores(dto)]
+
+    def search_batch(self, dto: VectorStoreBatchQueryParams) -> list[list[Document]]:
+        return [[result.document for result in results] for results in self.search_batch_with_scores(dto)]
+
+    def search_with_scores(self, dto: VectorStoreQueryParams) -> list[VectorSearchResult]:
+        return self.search_batch_with_scores(dto.to_batch())[0]
+
+    def search_batch_with_scores(self, dto: VectorStoreBatchQueryParams) -> list[list[VectorSearchResult]]:
+        """Запросы эмбеддятся один раз, каждый шард возвращает свой top-k, общий top-k - k ближайших из них."""
+        if dto.embeddings is None:
+            dto = dto.model_copy(update={'embeddings': self._embed_queries(dto.queries)})
+
+        shards = [shard for shard in self.shards if shard.exists()]
+        shard_results = self._map(lambda shard: shard.search_batch_with_scores(dto), shards)
+        return [
+            heapq.nsmallest(dto.max_results, (result for results in query_results for result in results),
+                            key=lambda result: result.distance)
+            for query_results in zip(*shard_results)
+        ]
+
+    def search_lexical(self, dto: VectorStoreQueryParams) -> list[VectorSearchResult]:
+        """Оценки BM25 считаются по статистике своего шарда, при равномерном разбиении они сопоставимы."""
+        shard_results = self._map(lambda shard: shard.search_lexical(dto), [shard for shard in self.shards if shard.exists()])
+        return heapq.nsmallest(
+            dto.max_results, (result for results in shard_results for result in results), key=lambda result: result.distance
+        )
+
+    def get_db_path(self) -> Path:
+        return self.db_path
+
+    def get_embeddings(self) -> Embeddings:
+        return self.embeddings
+
+    def _embed_queries(self, queries: list[str]) -> list[list[float]]:
+        if hasattr(self.embeddings, 'embed_queries'):
+            return self.embeddings.embed_queries(queries)
+        return [self.embeddings.embed_query(query) for query in queries]
+
+    @staticmethod
+    def _has_data(shard: FaissDB) -> bool:
+        return shard.exists() or shard.is_loaded() or bool(shard.pending)
+
+    def _write(self, handler: Callable, items: Iterable) -> list:
+        """Записывает версии шардов и публикует их вместе, при ошибке несохранённые изменения шардов отбрасываются."""
+        try:
+            results = self._map(handler, items)
+        except Exception:
+            self.discard()
+            raise
+        if any(shard.versions.staged for shard in self.shards):
+            self._publish({
+                shard.versions.shard: shard.versions.latest() for shard in self.shards if shard.versions.latest()
+            })
+        return results
+
+    def _publish(self, versions: dict[str, str]) -> None:
+        self.versions.publish_shards(len(self.shards), versions)
+        for shard in self.shards:
+            shard.versions.staged = None
+            shard.versions.prune()
+
+    def _shard(self, document_id: str) -> FaissDB:
+        return self.shards[self._shard_index(document_id)]
+
+    def _shard_index(self, document_id: str) -> int:
+        return int.from_bytes(text_digest(document_id)[:8], 'little') % len(self.shards)
+
+    def _partition(self, items: Iterable[T], key: Callable[[T], str]) -> dict[int, list[T]]:
+        partitions = {}
+        for item in items:
+            partitions.setdefault(self._shard_index(key(item)), []).append(item)
+        return partitions
+
+    def _map(self, handler: Callable, items: Iterable) -> list:
+        items = list(items)
+        if len(items) <= 1:
+            return [handler(item) for item in items]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='faiss-shard')
+        futures = [self._executor.submit(handler, item) for item in items]
+        # Ошибка одного шарда поднимается после завершения остальных, чтобы их можно было откатить
+        wait(futures)
+        return [future.result() for future in futures]
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+import zstandard
+
+SNAPSHOT_MAGIC: bytes = b'RAGSNAP1'
+SNAPSHOT_FORMAT: int = 1
+SNAPSHOT_SUFFIX: str = '.snap'
+# Окончание архива: длина оглавления и сигнатура
+FOOTER = struct.Struct('<Q8s')
+
+class SnapshotFormatError(Exception):
+    def __init__(self, archive: Path) -> None:
+        super().__init__(f"File {archive} is not a DB snapshot")
+
+class SnapshotChecksumError(Exception):
+    def __init__(self, archive: Path, file_name: str, offset: int) -> None:
+        super().__init__(f"Snapshot {archive} is corrupted: checksum mismatch in {file_name} at offset {offset}")
+
+class SnapshotPathError(Exception):
+    def __init__(self, archive: Path, file_name: str) -> None:
+        super().__init__(f"Snapshot {archive} contains file {file_name!r} outside of the target directory")
+
+@dataclass
+class SnapshotStats:
+    files: int = 0
+    chunks: int = 0
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+
+class SnapshotArchive:
+    """
+    Снимок файлов БД в архив: файлы режутся на блоки chunk_size_mb, каждый блок сжимается zstandard
+    независимо и хранит sha256 исходных данных. Оглавление пишется в конец архива.
+    Блоки сжимаются и распаковываются параллельно (zstandard и hashlib отпускают GIL),
+    распакованные блоки пишутся сразу на своё место в файле.
+    """
+    def __init__(self, chunk_size_mb: int = 16, level: int = 3, workers: int|None = None) -> None:
+        self.chunk_size = chunk_size_mb * 1024 * 1024
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+
+    def pack(self, source: Path, file_names: Iterable[str], archive: Path) -> SnapshotStats:
+        stats = SnapshotStats()
+        files = []
+        tmp_archive = archive.with_name(f".{archive.name}.tmp")
+        archive.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._write(source, file_names, tmp_archive, files, stats)
+        except BaseException:
+            tmp_archive.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_archive, archive)
+        return stats
+
+    def _write(self, source: Path, file_names: Iterable[str], path: Path, files: list, stats: SnapshotStats) -> None:
+        with open(path, 'wb') as output, ThreadPoolExecutor(self.workers) as executor:
+            for file_name in file_names:
+                chunks = []
+                for raw_offset, size, (data, checksum) in self._ordered(
+                        executor, self._compress, self._read_chunks(source / file_name)
+                ):
+                    chunks.append([output.tell(), len(data), raw_offset, size, checksum])
+                    output.write(data)
+                    stats.chunks += 1
+                    stats.raw_bytes += size
+                files.append({'name': file_name, 'size': sum(chunk[3] for chunk in chunks), 'chunks': chunks})
+                stats.files += 1
+
+            toc = json.dumps({'format': SNAPSHOT_FORMAT, 'chunk_size': self.chunk_size, 'files': files}).encode('utf-8')
+            output.write(toc)
+            output.write(FOOTER.pack(len(toc), SNAPSHOT_MAGIC))
+            stats.compressed_bytes = output.tell()
+            output.flush()
+            os.fsync(output.fileno())
+
+    def unpack(self, archive: Path, target: Path) -> SnapshotStats:
+        """
+        Распаковывает архив в target, каждый блок проверяется по контрольной сумме.
+        Архив с файлами вне target отклоняется до записи первого файла.
+        """
+        stats = SnapshotStats()
+        target.mkdir(parents=True, exist_ok=True)
+        with open(archive, 'rb') as source:
+            toc = self._read_toc(archive, source)
+            paths = {item['name']: self._target_path(archive, target, item['name']) for item in toc['files']}
+            descriptors = {}
+            try:
+                tasks = []
+                for item in toc['files']:
+                    descriptor = os.open(paths[item['name']], os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o644)
+                    descriptors[item['name']] = descriptor
+                    os.ftruncate(descriptor, item['size'])
+                    tasks += [(item['name'], descriptor, chunk) for chunk in item['chunks']]
+                    stats.files += 1
+
+                with ThreadPoolExecutor(self.workers) as executor:
+                    handler = lambda task: self._restore_chunk(archive, source.fileno(), *task)
+                    for size in executor.map(handler, tasks):
+                        stats.chunks += 1
+                        stats.raw_bytes += size
+                for descriptor in descriptors.values():
+                    os.fsync(descriptor)
+            finally:
+                for descriptor in descriptors.values():
+                    os.close(descriptor)
+            stats.compressed_bytes = archive.stat().st_size
+        return stats
+
+    def _read_chunks(self, path: Path) -> Iterator[tuple[int, bytes]]:
+        with open(path, 'rb') as file:
+            offset = 0
+            while data := file.read(self.chunk_size):
+                yield offset, data
+                offset += len(data)
+
+    def _compress(self, chunk: tuple[int, bytes]) -> tuple[int, int, tuple[bytes, str]]:
+        offset, data = chunk
+        # Компрессор не потокобезопасен, каждый блок сжимается своим
+        compressed = zstandard.ZstdCompressor(level=self.level).compress(data)
+        return offset, len(data), (compressed, hashlib.sha256(data).hexdigest())
+
+    @staticmethod
+    def _restore_chunk(archive: Path, source: int, file_name: str, descriptor: int, chunk: list) -> int:
+        offset, length, raw_offset, size, checksum = chunk
+        try:
+            data = zstandard.ZstdDecompressor().decompress(os.pread(source, length, offset), max_output_size=size)
+        except zstandard.ZstdError:
+            raise SnapshotChecksumError(archive, file_name, raw_offset)
+        if len(data) != size or hashlib.sha256(data).hexdigest() != checksum:
+            raise SnapshotChecksumError(archive, file_name, raw_offset)
+        os.pwrite(descriptor, data, raw_offset)
+        return size
+
+    @staticmethod
+    def _target_path(archive: Path, target: Path, file_name: str) -> Path:
+        """Имя файла из оглавления не должно выводить из target: абсолютный путь, .. и ссылки отклоняются."""
+        if not isinstance(file_name, str) or not file_name:
+            raise SnapshotPathError(archive, str(file_name))
+        root = target.resolve()
+        path = (root / file_name).resolve()
+        if path.parent != root:
+            raise SnapshotPathError(archive, file_name)
+        return path
+
+    @staticmethod
+    def _read_toc(archive: Path, source) -> dict:
+        size = archive.stat().st_size
+        if size < FOOTER.size:
+            raise SnapshotFormatError(archive)
+        source.seek(size - FOOTER.size)
+        toc_size, magic = FOOTER.unpack(source.read(FOOTER.size))
+        if magic != SNAPSHOT_MAGIC or toc_size > size - FOOTER.size:
+            raise SnapshotFormatError(archive)
+        source.seek(size - FOOTER.size - toc_size)
+        toc = json.loads(source.read(toc_size))
+        if toc.get('format') != SNAPSHOT_FORMAT:
+            raise SnapshotFormatError(archive)
+        return toc
+
+    def _ordered(self, executor: ThreadPoolExecutor, handler: Callable, items: Iterator) -> Iterator:
+        """Параллельная обработка с сохранением порядка; в памяти не больше 2 * workers блоков."""
+        window: list[Future] = []
+        for item in items:
+            window.append(executor.submit(handler, item))
+            if len(window) >= self.workers * 2:
+                yield window.pop(0).result()
+        for future in window:
+            yield future.result()
@@ -0,0 +1,282 @@
+import json
+import re
+import shutil
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain.schema import Document
+
+DOCSTORE_FILE: str = 'docstore.sqlite'
+# Страницы БД отображаются в память и разделяются между процессами через page cache ОС
+MMAP_SIZE: int = 1 << 30
+
+SCHEMA: tuple[str, ...] = (
+    "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS vectors (vector_id INTEGER PRIMARY KEY, document_id TEXT NOT NULL)",
+    # Инвертированный индекс скалярных полей метаданных: (поле, значение в JSON) -> id векторов
+    "CREATE TABLE IF NOT EXISTS metadata_index (field TEXT NOT NULL, value TEXT NOT NULL, vector_id INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS metadata_index_field_value ON metadata_index (field, value)",
+    # Тексты родительских фрагментов иерархического индекса, см. HierarchicalFaissDB
+    "CREATE TABLE IF NOT EXISTS parents (document_id TEXT NOT NULL, granularity TEXT NOT NULL, position INTEGER NOT NULL, "
+    "text TEXT NOT NULL, PRIMARY KEY (document_id, granularity, position)) WITHOUT ROWID",
+    # Полнотекстовый индекс для BM25 хранит только постинги, тексты читаются из documents по rowid.
+    # Триггеры поддерживают его при изменении documents; VACUUM, меняющий rowid, к файлу не применяется
+    "CREATE VIRTUAL TABLE IF NOT EXISTS lexical_index USING fts5("
+    "text, content='documents', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS documents_lexical_insert AFTER INSERT ON documents BEGIN "
+    "INSERT INTO lexical_index (rowid, text) VALUES (new.rowid, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS documents_lexical_delete AFTER DELETE ON documents BEGIN "
+    "INSERT INTO lexical_index (lexical_index, rowid, text) VALUES ('delete', old.rowid, old.text); END",
+)
+
+# Строки длиннее не индексируются: это тексты документа и его копии в других форматах, а не поля для фильтрации
+METADATA_VALUE_MAX_LENGTH: int = 256
+
+# Значения хранятся в JSON представлении, чтобы строка '1' и число 1 различались
+METADATA_INDEX_QUERY: str = f"""
+    INSERT INTO metadata_index (field, value, vector_id)
+    SELECT item.key,
+           CASE item.type WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' ELSE json_quote(item.value) END,
+           vectors.vector_id
+    FROM vectors JOIN documents ON documents.id = vectors.document_id, json_each(documents.metadata) AS item
+    WHERE item.type NOT IN ('object', 'array', 'null')
+      AND (item.type != 'text' OR length(item.value) <= {METADATA_VALUE_MAX_LENGTH})
+"""
+
+class MetadataFilterValueError(Exception):
+    def __init__(self, field: str) -> None:
+        super().__init__(f"Filter value of field '{field}' is longer than {METADATA_VALUE_MAX_LENGTH} characters and is not indexed")
+
+def lexical_query(text: str) -> str:
+    """Запрос FTS5 из слов текста: достаточно совпадения любого слова, ранжирование по BM25."""
+    return ' OR '.join(f'"{token}"' for token in dict.fromkeys(re.findall(r'\w+', text.lower())))
+
+def connect(path: Path, readonly: bool = True) -> sqlite3.Connection:
+    if readonly:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        connection = sqlite3.connect(str(path), check_same_thread=False)
+    connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    return connection
+
+def has_table(path: Path, name: str) -> bool:
+    if not path.exists():
+        return False
+    connection = connect(path)
+    try:
+        return bool(connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchall())
+    finally:
+        connection.close()
+
+class SqliteDocstore(Docstore, AddableMixin):
+    """
+    Docstore фрагментов в SQLite: документы читаются по id по запросу, без десериализации всего хранилища.
+    Файл открывается только для чтения, изменения копятся в памяти и записываются в новый файл при save.
+    """
+    def __init__(self, path: Path|None = None) -> None:
+        self.path = path
+        self.added: dict[str, Document] = {}
+        self.deleted: set[str] = set()
+        self._lock = threading.Lock()
+        self._connection = connect(path) if path is not None and path.exists() else None
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[tuple[str, Document]]) -> 'SqliteDocstore':
+        docstore = cls()
+        docstore.add(dict(documents))
+        return docstore
+
+    def search(self, search: str) -> Document|str:
+        if search in self.added:
+            return self.added[search]
+        rows = [] if search in self.deleted else self._rows(
+            "SELECT text, metadata FROM documents WHERE id = ?", (search,)
+        )
+        if not rows:
+            return f"ID {search} not found."
+        return Document(page_content=rows[0][0], metadata=json.loads(rows[0][1]))
+
+    def add(self, texts: dict[str, Document]) -> None:
+        self.added.update(texts)
+        self.deleted.difference_update(texts)
+
+    def delete(self, ids: list) -> None:
+        for document_id in ids:
+            self.added.pop(document_id, None)
+            self.deleted.add(document_id)
+
+    def index_map(self) -> 'SqliteIndexMap':
+        return SqliteIndexMap(self)
+
+    def read_index_map(self) -> dict[int, str]:
+        return dict(self._rows("SELECT vector_id, document_id FROM vectors"))
+
+    def alias_ids(self) -> set[str]:
+        """id фрагментов с алиасами дубликатов с учётом несохранённых изменений."""
+        stored = {
+            document_id for (document_id,) in
+            self._rows("SELECT id FROM documents WHERE json_extract(metadata, '$.aliases') IS NOT NULL")
+        }
+        added = {document_id for document_id, document in self.added.items() if 'aliases' in document.metadata}
+        return (stored - self.deleted - set(self.added)) | added
+
+    def has_changes(self) -> bool:
+        return bool(self.added or self.deleted)
+
+    def has_metadata_index(self) -> bool:
+        """Файлы, сохранённые до появления индекса метаданных, получат его при следующем save."""
+        return self._has_table('metadata_index')
+
+    def has_lexical_index(self) -> bool:
+        return self._has_table('lexical_index')
+
+    def has_parents(self) -> bool:
+        return self._has_table('parents')
+
+    def parent(self, document_id: str, granularity: str, position: int) -> str|None:
+        rows = self._rows(
+            "SELECT text FROM parents WHERE document_id = ? AND granularity = ? AND position = ?",
+            (document_id, granularity, position)
+        )
+        return rows[0][0] if rows else None
+
+    def filter_ids(self, filter: dict[str, Any]) -> np.ndarray:
+        """id векторов, метаданные которых удовлетворяют фильтру, по инвертированному индексу."""
+        query, args = self._filter_query(filter)
+        rows = self._rows(query, args) if query else []
+        return np.unique(np.array([row[0] for row in rows], dtype=np.int64))
+
+    def lexical_search(self, text: str, k: int, filter: dict[str, Any]|None = None) -> list[tuple[Document, float]]:
+        """BM25 поиск по полнотекстовому индексу: документы и оценки, лучшие первыми."""
+        match = lexical_query(text)
+        if not match:
+            return []
+
+        query = (
+            "SELECT documents.text, documents.metadata, bm25(lexical_index) AS score "
+            "FROM lexical_index JOIN documents ON documents.rowid = lexical_index.rowid "
+            "WHERE lexical_index MATCH ?"
+        )
+        args = (match,)
+        filter_query, filter_args = self._filter_query(filter or {})
+        if filter_query:
+            query += f" AND documents.id IN (SELECT document_id FROM vectors WHERE vector_id IN ({filter_query}))"
+            args += filter_args
+        # bm25() в SQLite возвращает оценку со знаком минус: меньше - релевантнее
+        rows = self._rows(f"{query} ORDER BY score LIMIT ?", args + (k,))
+        return [(Document(page_content=text, metadata=json.loads(metadata)), -score) for text, metadata, score in rows]
+
+    def save(self, path: Path, index_to_docstore_id: Mapping[int, str]) -> None:
+        """Копирует текущий файл и применяет к копии накопленные изменения."""
+        if self.path is not None and self.path.exists():
+            shutil.copyfile(self.path, path)
+
+        connection = connect(path, readonly=False)
+        try:
+            with connection:
+                lexical_index = connection.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lexical_index'"
+                ).fetchall()
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                if not lexical_index:
+                    # Файл, сохранённый до появления полнотекстового индекса
+                    connection.execute("INSERT INTO lexical_index (lexical_index) VALUES ('rebuild')")
+                # Явное удаление вместо INSERT OR REPLACE: замена строки не вызывает триггер удаления
+                connection.executemany(
+                    "DELETE FROM documents WHERE id = ?", ((i,) for i in self.deleted.union(self.added))
+                )
+                connection.executemany(
+                    "INSERT INTO documents (id, text, metadata) VALUES (?, ?, ?)",
+                    (
+                        (document_id, document.page_content, json.dumps(document.metadata, ensure_ascii=False, default=str))
+                        for document_id, document in self.added.items()
+                    )
+                )
+                # Отображение, прочитанное из этого же файла, уже скопировано вместе с ним
+                if not (isinstance(index_to_docstore_id, SqliteIndexMap) and index_to_docstore_id.docstore is self):
+                    connection.execute("DELETE FROM vectors")
+                    connection.executemany(
+                        "INSERT INTO vectors (vector_id, document_id) VALUES (?, ?)",
+                        ((int(vector_id), document_id) for vector_id, document_id in index_to_docstore_id.items())
+                    )
+                connection.execute("DELETE FROM metadata_index")
+                connection.execute(METADATA_INDEX_QUERY)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def save_parents(path: Path, parents: dict[str, dict[str, list[str]]|None], source: Path|None = None) -> None:
+        """
+        Заменяет родительские фрагменты документов в файле, сохранённом save. None - документ удалён.
+        source - docstore предыдущей версии, из которого копируются родители, если файл записан не из его копии.
+        """
+        connection = connect(path, readonly=False)
+        try:
+            if source is not None:
+                connection.execute("ATTACH DATABASE ? AS source", (str(source),))
+                with connection:
+                    connection.execute("INSERT OR REPLACE INTO parents SELECT * FROM source.parents")
+                connection.execute("DETACH DATABASE source")
+            with connection:
+                connection.executemany("DELETE FROM parents WHERE document_id = ?", ((i,) for i in parents))
+                connection.executemany(
+                    "INSERT INTO parents (document_id, granularity, position, text) VALUES (?, ?, ?, ?)",
+                    (
+                        (document_id, granularity, position, text)
+                        for document_id, granularities in parents.items() if granularities
+                        for granularity, texts in granularities.items()
+                        for position, text in enumerate(texts)
+                    )
+                )
+        finally:
+            connection.close()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _has_table(self, name: str) -> bool:
+        return bool(self._rows("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)))
+
+    @staticmethod
+    def _filter_query(filter: dict[str, Any]) -> tuple[str, tuple]:
+        queries, args = [], []
+        for field, values in filter.items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            if any(isinstance(value, str) and len(value) > METADATA_VALUE_MAX_LENGTH for value in values):
+                raise MetadataFilterValueError(field)
+            queries.append(
+                f"SELECT vector_id FROM metadata_index WHERE field = ? AND value IN ({', '.join('?' * len(values))})"
+            )
+            args += [field, *(json.dumps(value, ensure_ascii=False) for value in values)]
+        return ' INTERSECT '.join(queries), tuple(args)
+
+    def _rows(self, query: str, args: tuple = ()) -> list[tuple]:
+        if self._connection is None:
+            return []
+        with self._lock:
+            return self._connection.execute(query, args).fetchall()
+
+class SqliteIndexMap(Mapping):
+    """Отображение id вектора -> id фрагмента, читаемое из SQLite по запросу."""
+    def __init__(self, docstore: SqliteDocstore) -> None:
+        self.docstore = docstore
+
+    def __getitem__(self, vector_id: int) -> str:
+        rows = self.docstore._rows("SELECT document_id FROM vectors WHERE vector_id = ?", (int(vector_id),))
+        if not rows:
+            raise KeyError(vector_id)
+        return rows[0][0]
+
+    def __iter__(self) -> Iterator[int]:
+        return (row[0] for row in self.docstore._rows("SELECT vector_id FROM vectors ORDER BY vector_id"))
+
+    def __len__(self) -> int:
+        rows = self.docstore._rows("SELECT COUNT(*) FROM vectors")
+        return rows[0][0] if rows else 0
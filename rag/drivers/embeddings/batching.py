@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+
+@dataclass
+class EmbeddingBatchStats:
+    texts: int = 0
+    batches: int = 0
+    tokens: int = 0
+    # Токены с учётом дополнения каждого текста до самого длинного в батче
+    padded_tokens: int = 0
+
+    @property
+    def padding_efficiency(self) -> float:
+        return self.tokens / self.padded_tokens if self.padded_tokens else 1.0
+
+    def merge(self, other: 'EmbeddingBatchStats') -> None:
+        self.texts += other.texts
+        self.batches += other.batches
+        self.tokens += other.tokens
+        self.padded_tokens += other.padded_tokens
+
+def length_batches(lengths: list[int], max_batch_tokens: int, max_batch_size: int) -> list[list[int]]:
+    """
+    Разбивает тексты на батчи по убыванию длины в токенах: в батч попадают тексты близкой длины,
+    и на дополнение до самого длинного уходит мало вычислений.
+    Размер батча с дополнением не превышает max_batch_tokens, кроме батча из одного слишком длинного текста.
+    Возвращает номера текстов в исходном списке.
+    """
+    batches = []
+    batch = []
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        # Первый текст батча самый длинный, до его длины дополняются остальные
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * lengths[batch[0]] > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
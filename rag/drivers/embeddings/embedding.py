@@ -1,18 +1,190 @@
+import threading
+from dataclasses import replace
+from pathlib import Path
 from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
+from rag.drivers.embeddings.batching import EmbeddingBatchStats, length_batches
+from rag.drivers.embeddings.embedding_cache import EmbeddingCache
+from rag.drivers.embeddings.embedding_pool import EmbeddingWorkerPool
+from rag.drivers.embeddings.onnx_backend import export_onnx_model, session_options
+from rag.drivers.embeddings.query_cache import QueryEmbeddingCache
+from rag.utils.hash import text_digest
+from rag.utils.logger import logger
+from rag.utils.path import absolute_path
+
+EMBEDDING_BACKENDS: tuple[str, ...] = ('torch', 'onnx')
+DEFAULT_ONNX_DIR: str = 'cache/onnx'
+# Оценка длины текста в токенах, если токенизатор модели недоступен
+CHARS_PER_TOKEN: int = 4
+# Меньшие списки, например одиночные запросы, эмбеддятся в своём процессе без передачи в пул
+POOL_MIN_TEXTS: int = 16
+
+class EmbeddingBackendError(Exception):
+    def __init__(self, backend: str) -> None:
+        super().__init__(f"Undefined embedding backend: '{backend}', available: {', '.join(EMBEDDING_BACKENDS)}")
 
 class EmbeddingWrapper(Embeddings):
-    def __init__(self, model_name: str, driver: str) -> None:
+    def __init__(
+            self,
+            model_name: str,
+            driver: str,
+            cache_dir: Path|str|None = None,
+            max_batch_tokens: int|None = None,
+            max_batch_size: int = 32,
+            backend: str = 'torch',
+            quantization: str|None = None,
+            threads: int|None = None,
+            onnx_dir: Path|str = DEFAULT_ONNX_DIR,
+            query_cache_size: int = 0,
+            query_cache_ttl: float|None = None,
+            query_cache_dir: Path|str|None = None,
+    ) -> None:
+        """
+        max_batch_tokens - бюджет токенов на батч с учётом дополнения, тексты группируются по длине, см. length_batches.
+        None - весь список передаётся модели одним вызовом.
+        backend: torch|onnx. Для onnx модель экспортируется в onnx_dir, quantization - набор инструкций
+        для int8 квантования (см. QUANTIZATION_CONFIGS), threads - потоков ONNX Runtime на оператор.
+        query_cache_* - кеш векторов запросов, см. QueryEmbeddingCache, query_cache_size 0 - без кеша.
+        """
+        if backend not in EMBEDDING_BACKENDS:
+            raise EmbeddingBackendError(backend)
+        self.model_name = model_name
+        self.backend = backend
+        model_path = model_name
+        model_kwargs = {'device': driver}
+        if backend == 'onnx':
+            model_path, file_name = export_onnx_model(model_name, absolute_path(str(onnx_dir)), quantization)
+            model_kwargs.update(backend='onnx', model_kwargs={
+                'file_name': file_name,
+                'provider': 'CUDAExecutionProvider' if driver.startswith('cuda') else 'CPUExecutionProvider',
+                'session_options': session_options(threads),
+            })
         self.embedding = HuggingFaceEmbeddings(
-            model_name = model_name,
-            model_kwargs={'device': driver}
+            model_name = str(model_path),
+            model_kwargs=model_kwargs,
+            # Каждый батч обрабатывается моделью за один проход
+            encode_kwargs={'batch_size': max_batch_size}
+        )
+        # Векторы разных бэкендов немного расходятся, поэтому кешируются раздельно
+        cache_name = model_name if backend == 'torch' else f"{model_name}__onnx_{quantization or 'fp32'}"
+        self.cache = EmbeddingCache(cache_dir, cache_name) if cache_dir else None
+        self.query_cache = (
+            QueryEmbeddingCache(cache_name, query_cache_size, query_cache_ttl, query_cache_dir) if query_cache_size else None
         )
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.stats = EmbeddingBatchStats()
+        # Модель в процессах пула создаётся с теми же параметрами, кеши остаются в этом процессе
+        self.worker_kwargs = {
+            'model_name': model_name,
+            'driver': driver,
+            'max_batch_tokens': max_batch_tokens,
+            'max_batch_size': max_batch_size,
+            'backend': backend,
+            'quantization': quantization,
+            'onnx_dir': onnx_dir,
+        }
+        self.pool: EmbeddingWorkerPool|None = None
+        self._lock = threading.Lock()
 
     def embed_documents(self, documents: list[str]) -> list:
-        return self.embedding.embed_documents(documents)
+        if self.cache is None:
+            return self._embed(documents)
+
+        digests = [text_digest(document) for document in documents]
+        vectors = {digest: vector.tolist() for digest, vector in self.cache.get_many(digests).items()}
+
+        missing = {}
+        for digest, document in zip(digests, documents):
+            if digest not in vectors:
+                missing.setdefault(digest, document)
+
+        if missing:
+            embedded = self._embed(list(missing.values()))
+            self.cache.put_many(list(missing.keys()), embedded)
+            vectors.update(zip(missing.keys(), embedded))
+
+        return [vectors[digest] for digest in digests]
 
     def embed_query(self, query: str) -> list:
-        return self.embedding.embed_query(query)
+        return self.embed_queries([query])[0]
+
+    def embed_queries(self, queries: list[str]) -> list:
+        """Эмбеддинг пакета запросов одним вызовом модели, запросы из кеша в модель не передаются."""
+        if not queries:
+            return []
+        if self.query_cache is None:
+            return self._embed_queries(queries)
+
+        vectors = self.query_cache.get_many(queries)
+        missing = list(dict.fromkeys(query for query in queries if query not in vectors))
+        if missing:
+            embedded = self._embed_queries(missing)
+            self.query_cache.put_many(missing, embedded)
+            vectors.update(zip(missing, embedded))
+        return [vectors[query] for query in queries]
 
     def get_embedding(self) -> HuggingFaceEmbeddings:
-        return self.embedding
\ No newline at end of file
+        return self.embedding
+
+    def get_stats(self) -> EmbeddingBatchStats:
+        with self._lock:
+            return replace(self.stats)
+
+    def start_workers(self, workers: int) -> None:
+        """Переносит эмбеддинг больших списков в пул из workers процессов, см. EmbeddingWorkerPool."""
+        if self.pool is None:
+            self.pool = EmbeddingWorkerPool(workers, self.worker_kwargs)
+
+    def stop_workers(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def _embed_queries(self, queries: list[str]) -> list:
+        if getattr(self.embedding, 'query_encode_kwargs', None):
+            return [self.embedding.embed_query(query) for query in queries]
+        return self._embed(queries)
+
+    def _embed(self, texts: list[str]) -> list:
+        """Эмбеддинг батчами текстов близкой длины, результат в исходном порядке."""
+        if self.pool is not None and len(texts) >= POOL_MIN_TEXTS:
+            vectors, stats = self.pool.embed(texts)
+            self._record(stats)
+            return vectors
+        if not texts or self.max_batch_tokens is None:
+            return self.embedding.embed_documents(texts)
+
+        lengths = self._token_lengths(texts)
+        batches = length_batches(lengths, self.max_batch_tokens, self.max_batch_size)
+        vectors = [None] * len(texts)
+        for batch in batches:
+            for i, vector in zip(batch, self.embedding.embed_documents([texts[i] for i in batch])):
+                vectors[i] = vector
+
+        self._record(EmbeddingBatchStats(
+            texts=len(texts),
+            batches=len(batches),
+            tokens=sum(lengths),
+            padded_tokens=sum(len(batch) * lengths[batch[0]] for batch in batches),
+        ))
+        return vectors
+
+    def _record(self, stats: EmbeddingBatchStats) -> None:
+        with self._lock:
+            self.stats.merge(stats)
+        logger().debug(
+            f"Embedded {stats.texts} texts in {stats.batches} batches, padding efficiency {stats.padding_efficiency:.3f}"
+        )
+
+    def _token_lengths(self, texts: list[str]) -> list[int]:
+        """Длины в токенах с учётом обрезки до максимальной длины модели."""
+        client = getattr(self.embedding, '_client', None)
+        tokenizer = getattr(client, 'tokenizer', None)
+        max_length = getattr(client, 'max_seq_length', None)
+        if tokenizer is None:
+            lengths = [len(text) // CHARS_PER_TOKEN + 1 for text in texts]
+            return [min(length, max_length) for length in lengths] if max_length else lengths
+        return [
+            len(ids) for ids in tokenizer(texts, truncation=True, max_length=max_length or tokenizer.model_max_length)['input_ids']
+        ]
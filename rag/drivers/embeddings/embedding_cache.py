@@ -0,0 +1,112 @@
+import re
+import struct
+import threading
+from pathlib import Path
+import numpy as np
+from filelock import FileLock
+from rag.utils.path import absolute_path
+
+CACHE_MAGIC: bytes = b'EMBC'
+HEADER_FORMAT: str = '<4sI'
+HEADER_SIZE: int = struct.calcsize(HEADER_FORMAT)
+DIGEST_SIZE: int = 32
+REG_UNSAFE_FILENAME: str = r'[^\w.-]+'
+
+class EmbeddingCacheCorruptedError(Exception):
+    def __init__(self, cache_file: Path) -> None:
+        super().__init__(f"Embedding cache file {cache_file} is corrupted")
+
+class EmbeddingCacheDimensionError(Exception):
+    def __init__(self, cache_file: Path, expected: int, actual: int) -> None:
+        super().__init__(f"Embedding cache {cache_file} stores {expected}-dim vectors, got {actual}-dim")
+
+class EmbeddingCache:
+    """
+    Append-only кеш эмбеддингов на диске.
+    Один файл на модель: заголовок (magic, dim) и записи фиксированной длины (sha256 текста, вектор float32).
+    """
+    def __init__(self, cache_dir: Path|str, model_name: str) -> None:
+        self.cache_dir = absolute_path(str(cache_dir))
+        self.cache_file = self.cache_dir / f"{re.sub(REG_UNSAFE_FILENAME, '_', model_name)}.bin"
+        self.file_lock = FileLock(f"{self.cache_file}.lock")
+        self.lock = threading.Lock()
+        self.dim: int|None = None
+        self.rows: dict[bytes, int] = {}
+        self.vectors: np.ndarray|None = None
+        self.file_size = 0
+
+    def get_many(self, digests: list[bytes]) -> dict[bytes, np.ndarray]:
+        with self.lock:
+            self._refresh()
+            if self.vectors is None:
+                return {}
+            return {
+                digest: np.array(self.vectors[self.rows[digest]]['vector'])
+                for digest in digests if digest in self.rows
+            }
+
+    def put_many(self, digests: list[bytes], vectors: list[list[float]]) -> None:
+        if not digests:
+            return
+
+        matrix = np.asarray(vectors, dtype='<f4')
+        with self.lock, self.file_lock:
+            self._refresh()
+            dim = matrix.shape[1]
+            if self.dim is not None and self.dim != dim:
+                raise EmbeddingCacheDimensionError(self.cache_file, self.dim, dim)
+
+            records = np.empty(len(digests), dtype=self._record_dtype(dim))
+            records['key'] = digests
+            records['vector'] = matrix
+
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_file, 'ab') as file:
+                if file.tell() < HEADER_SIZE:
+                    file.truncate(0)
+                    file.write(struct.pack(HEADER_FORMAT, CACHE_MAGIC, dim))
+                else:
+                    # Обрезаем недописанную запись, оставшуюся после аварийного завершения
+                    file.truncate(self._aligned_size(file.tell(), dim))
+                file.write(records.tobytes())
+            self._refresh()
+
+    def __len__(self) -> int:
+        with self.lock:
+            self._refresh()
+            return len(self.rows)
+
+    def _refresh(self) -> None:
+        """Подхватывает записи, дописанные в файл с момента последнего чтения (в т.ч. другими процессами)."""
+        if not self.cache_file.exists():
+            return
+
+        file_size = self.cache_file.stat().st_size
+        if file_size == self.file_size or file_size < HEADER_SIZE:
+            return
+
+        if self.dim is None:
+            with open(self.cache_file, 'rb') as file:
+                magic, self.dim = struct.unpack(HEADER_FORMAT, file.read(HEADER_SIZE))
+            if magic != CACHE_MAGIC:
+                raise EmbeddingCacheCorruptedError(self.cache_file)
+
+        dtype = self._record_dtype(self.dim)
+        count = (self._aligned_size(file_size, self.dim) - HEADER_SIZE) // dtype.itemsize
+        if count == 0:
+            return
+
+        known = len(self.vectors) if self.vectors is not None else 0
+        self.vectors = np.memmap(self.cache_file, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+        for row, digest in enumerate(self.vectors['key'][known:].tolist(), start=known):
+            self.rows.setdefault(digest, row)
+        self.file_size = HEADER_SIZE + count * dtype.itemsize
+
+    @classmethod
+    def _aligned_size(cls, file_size: int, dim: int) -> int:
+        record_size = cls._record_dtype(dim).itemsize
+        return HEADER_SIZE + (file_size - HEADER_SIZE) // record_size * record_size
+
+    @staticmethod
+    def _record_dtype(dim: int) -> np.dtype:
+        return np.dtype([('key', f'V{DIGEST_SIZE}'), ('vector', '<f4', (dim,))])
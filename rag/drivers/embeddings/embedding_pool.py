@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.sharedctypes import Synchronized
+import numpy as np
+from rag.drivers.embeddings.batching import EmbeddingBatchStats
+
+# Тексты одной задачи: достаточно крупные, чтобы окупить передачу, и достаточно мелкие для балансировки
+DEFAULT_TASK_SIZE: int = 256
+
+_worker_embedding = None
+
+def _init_worker(kwargs: dict, threads: int, counter: Synchronized) -> None:
+    """Закрепляет процесс за своими threads ядрами и загружает модель."""
+    global _worker_embedding
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    if cores:
+        start = index * threads % len(cores)
+        os.sched_setaffinity(0, cores[start:start + threads] or cores)
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    # Импорт в процессе воркера: модуль обёртки импортирует этот модуль
+    from rag.drivers.embeddings.embedding import EmbeddingWrapper
+    _worker_embedding = EmbeddingWrapper(**kwargs, threads=threads)
+
+def _dimension() -> int:
+    return len(_worker_embedding.embed_documents(['dimension'])[0])
+
+def _embed_task(texts: list[str], positions: list[int], shm_name: str, shape: tuple[int, int]) -> EmbeddingBatchStats:
+    """Пишет векторы текстов в строки positions общей матрицы результата."""
+    _worker_embedding.stats = EmbeddingBatchStats()
+    vectors = _worker_embedding.embed_documents(texts)
+    shm = SharedMemory(name=shm_name)
+    try:
+        matrix = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        matrix[positions] = vectors
+        del matrix
+    finally:
+        shm.close()
+    return _worker_embedding.get_stats()
+
+class EmbeddingWorkerPool:
+    """
+    Пул процессов с моделью эмбеддингов в каждом: один процесс упирается в плохо масштабируемый
+    intra-op параллелизм PyTorch, а N процессов на своих ядрах загружают все ядра машины.
+    Тексты сортируются по длине и раздаются задачами по task_size, векторы возвращаются
+    через общую память без сериализации.
+    """
+    def __init__(self, workers: int, kwargs: dict, task_size: int = DEFAULT_TASK_SIZE) -> None:
+        """kwargs - параметры EmbeddingWrapper воркера, threads вычисляется по числу доступных ядер."""
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        self.workers = workers
+        self.threads = max(1, cores // workers)
+        self.task_size = task_size
+        self.dim: int|None = None
+        context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(kwargs, self.threads, context.Value('i', 0)),
+        )
+
+    def embed(self, texts: list[str]) -> tuple[list[list[float]], EmbeddingBatchStats]:
+        if self.dim is None:
+            self.dim = self.executor.submit(_dimension).result()
+
+        shape = (len(texts), self.dim)
+        shm = SharedMemory(create=True, size=max(len(texts) * self.dim * np.dtype(np.float32).itemsize, 1))
+        try:
+            # Соседние по длине тексты попадают в одну задачу, внутри воркера они бьются на батчи по токенам
+            order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+            futures = [
+                self.executor.submit(_embed_task, [texts[i] for i in task], task, shm.name, shape)
+                for task in (order[start:start + self.task_size] for start in range(0, len(order), self.task_size))
+            ]
+            stats = EmbeddingBatchStats()
+            for future in futures:
+                stats.merge(future.result())
+
+            matrix = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            vectors = matrix.tolist()
+            del matrix
+        finally:
+            shm.close()
+            shm.unlink()
+        return vectors, stats
+
+    def close(self) -> None:
+        self.executor.shutdown()
@@ -0,0 +1,57 @@
+import re
+from pathlib import Path
+from filelock import FileLock
+
+ONNX_MODEL_FILE: str = 'onnx/model.onnx'
+# Наборы инструкций для динамического int8 квантования, см. optimum AutoQuantizationConfig
+QUANTIZATION_CONFIGS: tuple[str, ...] = ('arm64', 'avx2', 'avx512', 'avx512_vnni')
+REG_UNSAFE_DIRNAME: str = r'[^\w.-]+'
+
+class OnnxQuantizationError(Exception):
+    def __init__(self, quantization: str) -> None:
+        super().__init__(f"Undefined ONNX quantization: '{quantization}', available: {', '.join(QUANTIZATION_CONFIGS)}")
+
+def onnx_model_file(quantization: str|None) -> str:
+    if quantization is None:
+        return ONNX_MODEL_FILE
+    if quantization not in QUANTIZATION_CONFIGS:
+        raise OnnxQuantizationError(quantization)
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+def export_onnx_model(model_name: str, export_dir: Path, quantization: str|None = None) -> tuple[Path, str]:
+    """
+    Экспортирует sentence-transformer в ONNX и при необходимости квантует веса в int8.
+    Экспорт выполняется один раз, модель сохраняется в export_dir.
+    Возвращает директорию модели и путь к onnx файлу внутри неё.
+    """
+    file_name = onnx_model_file(quantization)
+    path = export_dir / re.sub(REG_UNSAFE_DIRNAME, '_', model_name)
+    if (path / file_name).exists():
+        return path, file_name
+
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    export_dir.mkdir(parents=True, exist_ok=True)
+    # Модель могут одновременно запросить несколько процессов
+    with FileLock(f"{path}.lock"):
+        if not (path / ONNX_MODEL_FILE).exists():
+            SentenceTransformer(model_name, backend='onnx', device='cpu').save_pretrained(str(path))
+        if not (path / file_name).exists():
+            model = SentenceTransformer(str(path), backend='onnx', device='cpu')
+            export_dynamic_quantized_onnx_model(model, quantization, str(path))
+    return path, file_name
+
+def session_options(threads: int|None = None) -> 'onnxruntime.SessionOptions':
+    """
+    Параметры ONNX Runtime для CPU: threads потоков внутри оператора (None - по числу физических ядер),
+    операторы выполняются последовательно, чтобы потоки не конкурировали за ядра.
+    """
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    if threads:
+        options.intra_op_num_threads = threads
+    return options
@@ -0,0 +1,96 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from pathlib import Path
+from rag.drivers.embeddings.embedding_cache import EmbeddingCache
+from rag.utils.hash import text_digest
+
+@dataclass
+class QueryCacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+def normalize_query(query: str) -> str:
+    """Запросы, отличающиеся только пробелами или формой записи unicode, дают один ключ кеша."""
+    return ' '.join(unicodedata.normalize('NFC', query).split())
+
+class QueryEmbeddingCache:
+    """
+    Двухуровневый кеш векторов запросов.
+    В памяти процесса - LRU на max_size запросов, запись живёт ttl секунд (None - без ограничения).
+    На диске - необязательный постоянный кеш модели в cache_dir, см. EmbeddingCache:
+    вектор запроса детерминирован, поэтому срок жизни на диске не ограничивается.
+    """
+    def __init__(
+            self,
+            model_name: str,
+            max_size: int = 10000,
+            ttl: float|None = None,
+            cache_dir: Path|str|None = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk = EmbeddingCache(cache_dir, f"{model_name}__queries") if cache_dir else None
+        self.entries: OrderedDict[bytes, tuple[float, list[float]]] = OrderedDict()
+        self.stats = QueryCacheStats()
+        self._lock = threading.Lock()
+
+    def get_many(self, queries: list[str]) -> dict[str, list[float]]:
+        keys = {query: text_digest(normalize_query(query)) for query in queries}
+        vectors = {}
+        missing = {}
+        now = time.monotonic()
+        with self._lock:
+            for query, key in keys.items():
+                entry = self.entries.get(key)
+                if entry is not None and (self.ttl is None or now - entry[0] < self.ttl):
+                    self.entries.move_to_end(key)
+                    vectors[query] = list(entry[1])
+                    self.stats.hits += 1
+                else:
+                    missing[query] = key
+
+        if missing and self.disk is not None:
+            found = self.disk.get_many(list(set(missing.values())))
+            stored = {}
+            for query in [query for query, key in missing.items() if key in found]:
+                key = missing.pop(query)
+                vectors[query] = stored[key] = [float(value) for value in found[key]]
+            # Векторы с диска поднимаются в память, следующие запросы не читают файл
+            self._remember(stored)
+            with self._lock:
+                self.stats.disk_hits += len(stored)
+
+        with self._lock:
+            self.stats.misses += len(missing)
+        return vectors
+
+    def put_many(self, queries: list[str], vectors: list[list[float]]) -> None:
+        entries = {text_digest(normalize_query(query)): vector for query, vector in zip(queries, vectors)}
+        self._remember(entries)
+        if self.disk is not None and entries:
+            self.disk.put_many(list(entries.keys()), list(entries.values()))
+
+    def get_stats(self) -> QueryCacheStats:
+        with self._lock:
+            return replace(self.stats, size=len(self.entries))
+
+    def _remember(self, entries: dict[bytes, list[float]]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key, vector in entries.items():
+                self.entries[key] = (now, list(vector))
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
@@ -0,0 +1,47 @@
+from typing import Any
+from pydantic import BaseModel
+from rag.utils.logger import logger
+
+class IndexedChunk(BaseModel):
+    id: str
+    text: str
+    metadata: dict[str, Any]
+    embedding: list[float]|None = None
+
+class IndexedDocument(BaseModel):
+    id: str
+    hash: str
+    chunks: list[IndexedChunk]
+    parents: dict[str, list[str]] = {}
+
+class IndexSyncResult(BaseModel):
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+    def count(self, stored_hash: str|None, document_hash: str) -> None:
+        """Учитывает документ по хешу его версии в БД, None - документа в БД нет."""
+        if stored_hash is None:
+            self.added += 1
+        elif stored_hash != document_hash:
+            self.updated += 1
+        else:
+            self.unchanged += 1
+
+class IndexSyncCounter(BaseModel):
+    """Результат синхронизации, накапливаемый по потоку документов, и id встреченных документов."""
+    result: IndexSyncResult = IndexSyncResult()
+    seen_ids: set[str] = set()
+
+    def count(self, document: IndexedDocument, stored_hash: str|None) -> bool:
+        """
+        Учитывает документ по хешу его версии в БД, True - документ нужно записать.
+        Документ с уже встреченным id заменяет предыдущий и повторно не считается.
+        """
+        if document.id in self.seen_ids:
+            logger().warning(f"Duplicate document id {document.id}, the last document replaces previous ones")
+        else:
+            self.result.count(stored_hash, document.hash)
+        self.seen_ids.add(document.id)
+        return stored_hash != document.hash
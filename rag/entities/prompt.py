@@ -4,6 +4,9 @@ from rag.entities.document import DocumentCollection
 from string import Template
 
 REG_MORE_NEXT_LINE: str = r'\n{2,}'
+# Копии текста документа и служебные поля индекса остаются в метаданных для фильтрации, но не попадают в промпт
+HIDDEN_METADATA_FIELDS: tuple[str, ...] = ('text', 'text_html', 'text_markdown', 'parents', 'aliases')
+METADATA_VALUE_MAX_LENGTH: int = 256
 
 class Prompt(PromptContract):
     def __init__(self, prompt: str) -> None:
@@ -18,8 +21,18 @@ class Prompt(PromptContract):
     @staticmethod
     def _format_documents(documents: DocumentCollection) -> str:
         formatted_chunks = [
-            f"\n#### {i + 1} Relevant chunk ####\n{document.metadata}\n{document.text}\n"
+            f"\n#### {i + 1} Relevant chunk ####\n{Prompt._format_metadata(document.metadata)}\n{document.text}\n"
             for i, document in enumerate(documents.all())
         ]
         return re.sub(REG_MORE_NEXT_LINE, ' ', '\n ' . join(formatted_chunks))
 
+    @staticmethod
+    def _format_metadata(metadata: dict) -> dict:
+        """Короткие скалярные поля метаданных фрагмента."""
+        return {
+            key: value for key, value in metadata.items()
+            if key not in HIDDEN_METADATA_FIELDS
+            and isinstance(value, (str, int, float, bool))
+            and len(str(value)) <= METADATA_VALUE_MAX_LENGTH
+        }
+
@@ -1,5 +1,46 @@
+from typing import Any
+from langchain_core.documents import Document
 from pydantic import BaseModel
 
+# Фильтр по метаданным: {поле: значение} или {поле: [значения]}, условия по разным полям объединяются через И
+MetadataFilter = dict[str, Any]
+
 class VectorStoreQueryParams(BaseModel):
     query: str
-    max_results: int
\ No newline at end of file
+    max_results: int
+    embedding: list[float]|None = None
+    granularity: str|None = None
+    nprobe: int|None = None
+    ef_search: int|None = None
+    with_vectors: bool = False
+    filter: MetadataFilter|None = None
+
+    def to_batch(self) -> 'VectorStoreBatchQueryParams':
+        return VectorStoreBatchQueryParams(
+            queries=[self.query],
+            embeddings=[self.embedding] if self.embedding is not None else None,
+            max_results=self.max_results,
+            granularity=self.granularity,
+            nprobe=self.nprobe,
+            ef_search=self.ef_search,
+            with_vectors=self.with_vectors,
+            filter=self.filter,
+        )
+
+class VectorStoreBatchQueryParams(BaseModel):
+    """Пакет запросов: тексты или готовые векторы запросов."""
+    queries: list[str] = []
+    embeddings: list[list[float]]|None = None
+    max_results: int
+    granularity: str|None = None
+    nprobe: int|None = None
+    ef_search: int|None = None
+    with_vectors: bool = False
+    filter: MetadataFilter|None = None
+
+class VectorSearchResult(BaseModel):
+    """Найденный фрагмент с расстоянием из индекса, косинусной близостью к запросу и сохранённым вектором."""
+    document: Document
+    distance: float
+    similarity: float|None = None
+    embedding: list[float]|None = None
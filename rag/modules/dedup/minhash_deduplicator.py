@@ -0,0 +1,109 @@
+import re
+import zlib
+import numpy as np
+from rag.contracts.deduplicator import DeduplicatorContract
+from rag.entities.index import IndexedDocument
+from rag.utils.hash import data_hash
+
+REG_WORD: str = r'\w+'
+MERSENNE_PRIME: int = (1 << 31) - 1
+MAX_HASH: int = (1 << 32) - 1
+
+class MinHashDeduplicator(DeduplicatorContract):
+    """
+    Поиск почти одинаковых фрагментов через MinHash и LSH по полосам сигнатуры.
+    Фрагмент считается дубликатом, если оценка коэффициента Жаккара его шинглов
+    с уже встреченным фрагментом не меньше threshold.
+    """
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 5, seed: int = 1) -> None:
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = self._optimal_bands(threshold, num_perm)
+        generator = np.random.default_rng(seed)
+        self.perm_a = generator.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.perm_b = generator.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.reset()
+
+    def reset(self) -> None:
+        self.buckets: list[dict[bytes, list[int]]] = [{} for _ in range(self.bands)]
+        self.signatures: list[np.ndarray] = []
+        self.keys: list[str] = []
+        self.aliases: dict[str, list[dict]] = {}
+
+    def deduplicate(self, document: IndexedDocument) -> IndexedDocument:
+        chunks = []
+        for chunk in document.chunks:
+            duplicate = self.find_duplicate(chunk.id, chunk.text)
+            if duplicate is None:
+                chunks.append(chunk)
+                continue
+            original_id, similarity = duplicate
+            self.aliases.setdefault(original_id, []).append({
+                'id': chunk.id,
+                'document_id': document.id,
+                'similarity': round(similarity, 4),
+            })
+
+        if len(chunks) == len(document.chunks):
+            return document
+        # Хеш учитывает удалённые дубликаты: при обновлении документ переиндексируется, когда их набор меняется,
+        # например после изменения или удаления документа с оригиналом, и бывший дубликат попадает в индекс
+        duplicates = sorted({chunk.id for chunk in document.chunks} - {chunk.id for chunk in chunks})
+        return document.model_copy(update={
+            'chunks': chunks,
+            'hash': data_hash({'hash': document.hash, 'duplicates': duplicates}),
+        })
+
+    def get_aliases(self) -> dict[str, list[dict]]:
+        return self.aliases
+
+    def find_duplicate(self, key: str, text: str) -> tuple[str, float]|None:
+        signature = self._signature(text)
+        band_keys = [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)
+        ]
+
+        candidates = set()
+        for band, band_key in enumerate(band_keys):
+            candidates.update(self.buckets[band].get(band_key, []))
+        best = None
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (self.keys[candidate], similarity)
+        if best is not None:
+            return best
+
+        position = len(self.keys)
+        self.keys.append(key)
+        self.signatures.append(signature)
+        for band, band_key in enumerate(band_keys):
+            self.buckets[band].setdefault(band_key, []).append(position)
+        return None
+
+    def _signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in self._shingles(text)),
+            dtype=np.uint64
+        )
+        if hashes.size == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        permuted = (np.outer(hashes, self.perm_a) + self.perm_b) % MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def _shingles(self, text: str) -> set[str]:
+        words = re.findall(REG_WORD, text.lower())
+        if len(words) <= self.shingle_size:
+            return {' '.join(words)} if words else set()
+        return {' '.join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    @staticmethod
+    def _optimal_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+        """Подбирает число полос b и строк r так, чтобы порог LSH (1/b)^(1/r) был ближе всего к threshold."""
+        best = (num_perm, 1)
+        for rows in range(1, num_perm + 1):
+            bands = num_perm // rows
+            if abs((1 / bands) ** (1 / rows) - threshold) < abs((1 / best[0]) ** (1 / best[1]) - threshold):
+                best = (bands, rows)
+        return best
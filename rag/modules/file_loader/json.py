@@ -1,6 +1,8 @@
 import json
 from json.decoder import JSONDecodeError
 from pathlib import Path
+from typing import Iterator
+import ijson
 from rag.contracts.file_loader import FileLoaderContract
 from rag.entities.document import DocumentCollection, Document
 
@@ -28,4 +30,18 @@ class JsonFileLoader(FileLoaderContract):
                     ))
                 return documents
         except(JSONDecodeError):
-            raise JsonDecodeFailed(file_path)
\ No newline at end of file
+            raise JsonDecodeFailed(file_path)
+
+    def iterate(self, file_path: Path) -> Iterator[Document]:
+        if not file_path.is_file():
+            raise JsonFileNotFound(file_path)
+
+        try:
+            with open(file_path, 'rb') as file:
+                for document in ijson.items(file, 'item', use_float=True):
+                    yield Document(
+                        text=document.get('text'),
+                        metadata=document.get('metadata', {}),
+                    )
+        except ijson.JSONError:
+            raise JsonDecodeFailed(file_path)
@@ -0,0 +1,60 @@
+from rag.contracts.splitter import SplitterContract
+from rag.entities.document import Document
+from rag.entities.index import IndexedDocument
+from rag.services.index_document_service import IndexDocumentService
+
+class DocumentChunker:
+    """Разбивает документ на фрагменты для индексации. Без сплиттера документ индексируется целиком."""
+    def __init__(self, splitter: SplitterContract|None = None) -> None:
+        self.splitter = splitter
+
+    def prepare(self, document: Document) -> IndexedDocument:
+        chunks = self.splitter.split_text(document.text) if self.splitter else [document.text]
+        return IndexDocumentService.make(document, chunks)
+
+class HierarchicalDocumentChunker(DocumentChunker):
+    """
+    Разбивает документ на мелкие фрагменты и для каждого запоминает родительские фрагменты крупных гранулярностей.
+    Эмбеддятся только мелкие фрагменты, тексты родителей хранятся рядом с индексом.
+    """
+    def __init__(self, splitter: SplitterContract, parent_splitters: dict[str, SplitterContract]) -> None:
+        super().__init__(splitter)
+        self.parent_splitters = parent_splitters
+
+    def prepare(self, document: Document) -> IndexedDocument:
+        chunks = self.splitter.split_text(document.text)
+        spans = self.spans(document.text, chunks)
+        parents = {}
+        chunk_parents = [{} for _ in chunks]
+        for granularity, splitter in self.parent_splitters.items():
+            parents[granularity] = splitter.split_text(document.text)
+            parent_spans = self.spans(document.text, parents[granularity])
+            for i, span in enumerate(spans):
+                chunk_parents[i][granularity] = self.parent_index(span, parent_spans)
+        return IndexDocumentService.make(document, chunks, parents, chunk_parents)
+
+    @staticmethod
+    def spans(text: str, chunks: list[str]) -> list[tuple[int, int]]:
+        """
+        Позиции фрагментов в тексте.
+        Если сплиттер изменил текст (html, markdown), позиция считается по длине предыдущих фрагментов.
+        """
+        spans = []
+        for chunk in chunks:
+            start = text.find(chunk, spans[-1][0] + 1 if spans else 0)
+            if start < 0:
+                start = spans[-1][1] if spans else 0
+            spans.append((start, start + len(chunk)))
+        return spans
+
+    @staticmethod
+    def parent_index(span: tuple[int, int], parent_spans: list[tuple[int, int]]) -> int:
+        """Родитель - фрагмент с наибольшим пересечением, при отсутствии пересечений - ближайший слева."""
+        best, best_overlap = 0, 0
+        for i, (start, end) in enumerate(parent_spans):
+            overlap = min(end, span[1]) - max(start, span[0])
+            if overlap > best_overlap:
+                best, best_overlap = i, overlap
+            elif best_overlap == 0 and start <= span[0]:
+                best = i
+        return best
@@ -0,0 +1,89 @@
+from pathlib import Path
+from typing import Callable, Iterable
+from rag.contracts.deduplicator import DeduplicatorContract
+from rag.contracts.file_loader import FileLoaderContract
+from rag.contracts.index_db import IndexDBContract
+from rag.contracts.indexer import IndexerContract
+from rag.entities.document import DocumentCollection, Document
+from rag.entities.index import IndexedDocument, IndexSyncResult
+from rag.modules.indexes.pipeline import IndexingPipeline
+from rag.modules.indexes.document_chunker import DocumentChunker
+
+class DocumentIndexer(IndexerContract):
+    """Индексатор одной БД: наследники отличаются только разбиением документа на фрагменты, см. DocumentChunker."""
+    def __init__(self,
+                 db_client: IndexDBContract,
+                 file_loader: FileLoaderContract,
+                 chunker: DocumentChunker,
+                 deduplicator: DeduplicatorContract|None = None,
+    ) -> None:
+        self.db_client = db_client
+        self.file_loader = file_loader
+        self.chunker = chunker
+        self.deduplicator = deduplicator
+
+    def index_by_path(self, dataset_path: Path) -> None:
+        self.index(self.file_loader.load(dataset_path))
+
+    def index(self, documents: DocumentCollection) -> None:
+        self._reset()
+        documents = self._prepare(documents)
+        self._update_aliases()
+        self.db_client.create_db(documents)
+
+    def update_by_path(self, dataset_path: Path) -> IndexSyncResult:
+        return self.update(self.file_loader.load(dataset_path))
+
+    def update(self, documents: DocumentCollection) -> IndexSyncResult:
+        self._reset()
+        documents = self._prepare(documents)
+        self._update_aliases()
+        return self.db_client.sync(documents)
+
+    def stream_by_path(
+            self,
+            dataset_path: Path,
+            batch_size: int,
+            queue_depth: int,
+            update: bool = False,
+            checkpoint_every: int|None = None,
+            on_checkpoint: Callable[[int], None]|None = None,
+    ) -> IndexSyncResult:
+        return self.stream(
+            self.file_loader.iterate(dataset_path), batch_size, queue_depth, update, checkpoint_every, on_checkpoint
+        )
+
+    def stream(
+            self,
+            documents: Iterable[Document],
+            batch_size: int,
+            queue_depth: int,
+            update: bool = False,
+            checkpoint_every: int|None = None,
+            on_checkpoint: Callable[[int], None]|None = None,
+    ) -> IndexSyncResult:
+        self._reset()
+        return IndexingPipeline(
+            self.db_client, batch_size, queue_depth, checkpoint_every, on_checkpoint,
+            aliases=self.deduplicator.get_aliases if self.deduplicator is not None else None,
+        ).run((self._prepare_document(document) for document in documents), update)
+
+    def _prepare(self, documents: DocumentCollection) -> list[IndexedDocument]:
+        return [self._prepare_document(document) for document in documents.all()]
+
+    def _prepare_document(self, document: Document) -> IndexedDocument:
+        return self._deduplicate(self.chunker.prepare(document))
+
+    def _deduplicate(self, document: IndexedDocument) -> IndexedDocument:
+        if self.deduplicator is None:
+            return document
+        return self.deduplicator.deduplicate(document)
+
+    def _reset(self) -> None:
+        if self.deduplicator is not None:
+            self.deduplicator.reset()
+
+    def _update_aliases(self) -> None:
+        """Алиасы известны после разбиения всех документов и записываются тем же save, что и фрагменты."""
+        if self.deduplicator is not None:
+            self.db_client.update_aliases(self.deduplicator.get_aliases())
@@ -0,0 +1,159 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+from rag.contracts.deduplicator import DeduplicatorContract
+from rag.contracts.index_db import IndexDBContract
+from rag.entities.document import Document
+from rag.entities.index import IndexedDocument, IndexedChunk, IndexSyncResult, IndexSyncCounter
+from rag.modules.indexes.document_chunker import DocumentChunker
+from rag.utils.logger import logger
+
+_worker_chunkers: dict[str, DocumentChunker] = {}
+
+def _init_worker(chunkers: dict[str, DocumentChunker]) -> None:
+    global _worker_chunkers
+    _worker_chunkers = chunkers
+
+def _split_batch(names: list[str], documents: list[Document]) -> dict[str, list[IndexedDocument]]:
+    result = {}
+    for name in names:
+        chunker = _worker_chunkers[name]
+        result[name] = [chunker.prepare(document) for document in documents]
+    return result
+
+@dataclass
+class FanOutTarget:
+    name: str
+    text_type: str
+    db_client: IndexDBContract
+    chunker: DocumentChunker = field(default_factory=DocumentChunker)
+    deduplicator: DeduplicatorContract|None = None
+    update: bool = False
+    counter: IndexSyncCounter = field(default_factory=IndexSyncCounter)
+    written: int = 0
+    checkpoint: int = 0
+
+class FanOutIndexer:
+    """
+    Однопроходная индексация в несколько БД.
+    Документы каждого типа разбиваются сразу под все конфигурации чанков в пуле процессов,
+    уникальные тексты фрагментов эмбеддятся один раз и раздаются во все целевые БД.
+    """
+    def __init__(
+            self,
+            targets: list[FanOutTarget],
+            workers: int,
+            batch_size: int,
+            documents_per_task: int = 64,
+            checkpoint_every: int|None = None,
+            on_checkpoint: Callable[[str, int], None]|None = None,
+    ) -> None:
+        self.targets = {target.name: target for target in targets}
+        self.workers = workers
+        self.batch_size = batch_size
+        self.documents_per_task = documents_per_task
+        self.checkpoint_every = checkpoint_every
+        self.on_checkpoint = on_checkpoint
+
+    def index(self, documents: dict[str, list[Document]], update: bool = False) -> dict[str, IndexSyncResult]:
+        targets = self._active_targets(update)
+        names_by_type = {}
+        for target in targets:
+            if target.deduplicator:
+                target.deduplicator.reset()
+            names_by_type.setdefault(target.text_type, []).append(target.name)
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=({target.name: target.chunker for target in targets},),
+        ) as executor:
+            tasks = self._tasks(documents, names_by_type)
+            pending: set[Future] = set()
+            for names, batch in tasks:
+                pending.add(executor.submit(_split_batch, names, batch))
+                if len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._write(future.result())
+            for future in pending:
+                self._write(future.result())
+
+        for target in targets:
+            if update or target.update:
+                stale_ids = list(target.db_client.document_ids() - target.counter.seen_ids)
+                target.db_client.delete(stale_ids)
+                target.counter.result.deleted = len(stale_ids)
+            if target.deduplicator:
+                target.db_client.update_aliases(target.deduplicator.get_aliases())
+            result = target.counter.result
+            if result.added or result.updated or result.deleted:
+                target.db_client.save()
+
+        return {target.name: target.counter.result for target in targets}
+
+    def _active_targets(self, update: bool) -> list[FanOutTarget]:
+        targets = []
+        for target in self.targets.values():
+            if not (update or target.update) and target.db_client.exists():
+                logger().error(f"Index DB for {target.name} already exists, skipped")
+                continue
+            targets.append(target)
+        return targets
+
+    def _tasks(
+            self,
+            documents: dict[str, list[Document]],
+            names_by_type: dict[str, list[str]]
+    ) -> Iterator[tuple[list[str], list[Document]]]:
+        for text_type, names in names_by_type.items():
+            items = documents.get(text_type, [])
+            for i in range(0, len(items), self.documents_per_task):
+                yield names, items[i:i + self.documents_per_task]
+
+    def _write(self, results: dict[str, list[IndexedDocument]]) -> None:
+        changed = {}
+        for name, documents in results.items():
+            target = self.targets[name]
+            changed[name] = []
+            for document in documents:
+                if target.deduplicator:
+                    document = target.deduplicator.deduplicate(document)
+                if target.counter.count(document, target.db_client.document_hash(document.id)):
+                    changed[name].append(document)
+
+        self._embed_shared(changed)
+        for name, documents in changed.items():
+            if documents:
+                self.targets[name].db_client.upsert(documents)
+                self._checkpoint(self.targets[name], len(documents))
+
+    def _checkpoint(self, target: FanOutTarget, written: int) -> None:
+        target.written += written
+        if not self.checkpoint_every or target.written - target.checkpoint < self.checkpoint_every:
+            return
+
+        target.db_client.checkpoint()
+        target.checkpoint = target.written
+        if self.on_checkpoint:
+            self.on_checkpoint(target.name, target.written)
+
+    def _embed_shared(self, changed: dict[str, list[IndexedDocument]]) -> None:
+        """Эмбеддит каждый уникальный текст один раз на модель и раздаёт вектор всем фрагментам с этим текстом."""
+        groups: dict[int, tuple[IndexDBContract, dict[str, list[IndexedChunk]]]] = {}
+        for name, documents in changed.items():
+            db_client = self.targets[name].db_client
+            _, chunks_by_text = groups.setdefault(id(db_client.get_embeddings()), (db_client, {}))
+            for document in documents:
+                for chunk in document.chunks:
+                    chunks_by_text.setdefault(chunk.text, []).append(chunk)
+
+        for db_client, chunks_by_text in groups.values():
+            unique = [chunks[0] for chunks in chunks_by_text.values()]
+            for i in range(0, len(unique), self.batch_size):
+                db_client.embed_chunks(unique[i:i + self.batch_size])
+            for chunks in chunks_by_text.values():
+                for chunk in chunks[1:]:
+                    chunk.embedding = chunks[0].embedding
@@ -0,0 +1,26 @@
+from rag.contracts.deduplicator import DeduplicatorContract
+from rag.contracts.file_loader import FileLoaderContract
+from rag.contracts.splitter import SplitterContract
+from rag.drivers.databases.hierarchical_faiss_db import HierarchicalFaissDB
+from rag.modules.indexes.document_chunker import HierarchicalDocumentChunker
+from rag.modules.indexes.splitter_indexer import SimpleIndexer
+
+PARENT_SPLITTER_PREFIX: str = 'parent_'
+
+class HierarchicalIndexer(SimpleIndexer):
+    """
+    Индексатор одной БД для всех гранулярностей.
+    Родительские сплиттеры передаются аргументами parent_<гранулярность>, например parent_1024.
+    """
+    def __init__(self,
+                 splitter: SplitterContract,
+                 db_client: HierarchicalFaissDB,
+                 file_loader: FileLoaderContract,
+                 deduplicator: DeduplicatorContract|None = None,
+                 **parent_splitters: SplitterContract,
+    ) -> None:
+        super().__init__(splitter, db_client, file_loader, deduplicator)
+        self.chunker = HierarchicalDocumentChunker(splitter, {
+            name.removeprefix(PARENT_SPLITTER_PREFIX): parent_splitter
+            for name, parent_splitter in parent_splitters.items()
+        })
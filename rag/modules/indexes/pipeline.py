@@ -0,0 +1,156 @@
+import threading
+from queue import Queue, Full, Empty
+from typing import Any, Callable, Iterable, Iterator
+from rag.contracts.index_db import IndexDBContract
+from rag.entities.index import IndexedDocument, IndexSyncResult, IndexSyncCounter
+
+QUEUE_POLL_TIMEOUT: float = 0.1
+
+class IndexDBExistError(Exception):
+    def __init__(self) -> None:
+        super().__init__("Index DB already exists, use update mode")
+
+class IndexingPipelineError(Exception):
+    def __init__(self, stage: str, error: Exception) -> None:
+        super().__init__(f"Indexing pipeline stage '{stage}' failed: {str(error)}")
+
+class _EndOfStream:
+    pass
+
+END_OF_STREAM = _EndOfStream()
+
+class IndexingPipeline:
+    """
+    Потоковая индексация: чтение и разбиение -> эмбеддинг батчами -> добавление в индекс.
+    Стадии работают в отдельных потоках и связаны очередями ограниченной длины,
+    поэтому в памяти одновременно находится не больше queue_depth батчей.
+    Каждые checkpoint_every записанных документов БД сохраняется на диск.
+    """
+    def __init__(
+            self,
+            db_client: IndexDBContract,
+            batch_size: int,
+            queue_depth: int,
+            checkpoint_every: int|None = None,
+            on_checkpoint: Callable[[int], None]|None = None,
+            aliases: Callable[[], dict[str, list[dict]]]|None = None,
+    ) -> None:
+        """aliases - алиасы дубликатов, известные после чтения всех документов, пишутся последним save."""
+        self.db_client = db_client
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.checkpoint_every = checkpoint_every
+        self.on_checkpoint = on_checkpoint
+        self.aliases = aliases
+        self.stop = threading.Event()
+        self.errors: list[IndexingPipelineError] = []
+
+    def run(self, documents: Iterable[IndexedDocument], update: bool = False) -> IndexSyncResult:
+        if not update and self.db_client.exists():
+            raise IndexDBExistError()
+
+        counter = IndexSyncCounter()
+        prepared: Queue = Queue(maxsize=self.queue_depth)
+        embedded: Queue = Queue(maxsize=self.queue_depth)
+
+        stages = [
+            threading.Thread(target=self._stage, args=('prepare', self._prepare, documents, prepared), daemon=True),
+            threading.Thread(target=self._stage, args=('embed', self._embed, prepared, embedded, counter), daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+
+        try:
+            self._write(embedded)
+        except Exception as e:
+            self._fail('write', e)
+        finally:
+            self.stop.set()
+            for stage in stages:
+                stage.join()
+
+        if self.errors:
+            raise self.errors[0]
+
+        if update:
+            stale_ids = list(self.db_client.document_ids() - counter.seen_ids)
+            self.db_client.delete(stale_ids)
+            counter.result.deleted = len(stale_ids)
+
+        if self.aliases:
+            self.db_client.update_aliases(self.aliases())
+        if counter.result.added or counter.result.updated or counter.result.deleted:
+            self.db_client.save()
+        return counter.result
+
+    def _write(self, source: Queue) -> None:
+        written = 0
+        checkpoint = 0
+        for batch in self._consume(source):
+            self.db_client.upsert(batch)
+            written += len(batch)
+            if self.checkpoint_every and written - checkpoint >= self.checkpoint_every:
+                self.db_client.checkpoint()
+                checkpoint = written
+                if self.on_checkpoint:
+                    self.on_checkpoint(written)
+
+    def _stage(self, name: str, handler, *args: Any) -> None:
+        try:
+            handler(*args)
+        except Exception as e:
+            self._fail(name, e)
+
+    def _prepare(self, documents: Iterable[IndexedDocument], output: Queue) -> None:
+        for document in documents:
+            if not self._put(output, document):
+                return
+        self._put(output, END_OF_STREAM)
+
+    def _embed(self, source: Queue, output: Queue, counter: IndexSyncCounter) -> None:
+        batch = []
+        chunks_count = 0
+        for document in self._consume(source):
+            if not counter.count(document, self.db_client.document_hash(document.id)):
+                continue
+
+            batch.append(document)
+            chunks_count += len(document.chunks)
+            if chunks_count >= self.batch_size:
+                if not self._put(output, self._embed_batch(batch)):
+                    return
+                batch = []
+                chunks_count = 0
+
+        if batch and not self._put(output, self._embed_batch(batch)):
+            return
+        self._put(output, END_OF_STREAM)
+
+    def _embed_batch(self, batch: list[IndexedDocument]) -> list[IndexedDocument]:
+        chunks = [chunk for document in batch for chunk in document.chunks]
+        for i in range(0, len(chunks), self.batch_size):
+            self.db_client.embed_chunks(chunks[i:i + self.batch_size])
+        return batch
+
+    def _consume(self, source: Queue) -> Iterator[Any]:
+        while not self.stop.is_set():
+            try:
+                item = source.get(timeout=QUEUE_POLL_TIMEOUT)
+            except Empty:
+                continue
+            if item is END_OF_STREAM:
+                return
+            yield item
+
+    def _put(self, output: Queue, item: Any) -> bool:
+        while not self.stop.is_set():
+            try:
+                output.put(item, timeout=QUEUE_POLL_TIMEOUT)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _fail(self, stage: str, error: Exception) -> None:
+        self.errors.append(IndexingPipelineError(stage, error))
+        self.stop.set()
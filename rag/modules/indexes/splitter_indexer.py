@@ -1,29 +1,17 @@
-from pathlib import Path
-from langchain_core.documents import Document
+from rag.contracts.deduplicator import DeduplicatorContract
 from rag.contracts.file_loader import FileLoaderContract
 from rag.contracts.index_db import IndexDBContract
-from rag.contracts.indexer import IndexerContract
 from rag.contracts.splitter import SplitterContract
-from rag.entities.document import DocumentCollection
+from rag.modules.indexes.document_chunker import DocumentChunker
+from rag.modules.indexes.document_indexer import DocumentIndexer
 
-class SimpleIndexer(IndexerContract):
+class SimpleIndexer(DocumentIndexer):
+    """Индексирует фрагменты документа, нарезанные сплиттером."""
     def __init__(self,
                  splitter: SplitterContract,
                  db_client: IndexDBContract,
                  file_loader: FileLoaderContract,
+                 deduplicator: DeduplicatorContract|None = None,
     ) -> None:
+        super().__init__(db_client, file_loader, DocumentChunker(splitter), deduplicator)
         self.splitter = splitter
-        self.db_client = db_client
-        self.file_loader = file_loader
-
-    def index_by_path(self, dataset_path: Path) -> None:
-        self.index(self.file_loader.load(dataset_path))
-
-    def index(self, documents: DocumentCollection) -> None:
-        dataset = []
-        for document in documents.all():
-            chunks = self.splitter.split_text(document.text)
-            for chunk in chunks:
-                dataset.append(Document(page_content=chunk, metadata=document.metadata))
-
-        self.db_client.create_db(dataset)
\ No newline at end of file
@@ -2,7 +2,7 @@ from rag.contracts.llm import LLMContract
 from rag.contracts.prompt import PromptContract
 from rag.contracts.rag import RagContract
 from rag.contracts.retriever import RetrieverContract
-from rag.entities.vector_store import VectorStoreQueryParams
+from rag.entities.vector_store import VectorStoreQueryParams, MetadataFilter
 
 class SimpleRAG(RagContract):
     def __init__(
@@ -11,15 +11,20 @@ class SimpleRAG(RagContract):
             prompt: PromptContract,
             llm: LLMContract,
             max_search_results: int,
+            filter: MetadataFilter|None = None,
     ) -> None:
+        """filter - ограничение поиска по метаданным фрагментов, например {'url': [...]}."""
         self.llm = llm
         self.retriever = retriever
         self.prompt = prompt
         self.max_search_results = max_search_results
+        self.filter = filter
 
     def query(self, question: str) -> str:
         formatted_content = self.prompt.render(
             question=question,
-            context=self.retriever.search(VectorStoreQueryParams(query=question, max_results=self.max_search_results))
+            context=self.retriever.search(VectorStoreQueryParams(
+                query=question, max_results=self.max_search_results, filter=self.filter
+            ))
         )
         return self.llm.generate(formatted_content)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from rag.contracts.lexical_search import LexicalSearchContract
+from rag.contracts.retriever import RetrieverContract
+from rag.entities.document import DocumentCollection, Document
+from rag.entities.vector_store import VectorStoreQueryParams
+from rag.utils.logger import logger
+
+class BM25Retriever(RetrieverContract):
+    """Лексический поиск BM25 по полнотекстовому индексу, который индексаторы строят вместе с векторной БД."""
+    def __init__(self, client: LexicalSearchContract, granularity: str|None = None) -> None:
+        self.client = client
+        self.granularity = granularity
+
+    def search(self, params: VectorStoreQueryParams) -> DocumentCollection:
+        if params.granularity is None and self.granularity is not None:
+            params = params.model_copy(update={'granularity': self.granularity})
+        documents = DocumentCollection()
+        for result in self.client.search_lexical(params):
+            logger().debug(f"bm25: {result.similarity:.3f} text: {result.document.page_content}")
+            documents.push(Document(text=result.document.page_content, metadata=result.document.metadata))
+        return documents
@@ -1,16 +1,30 @@
 from rag.contracts.retriever import RetrieverContract
-from rag.drivers.databases.faiss_db import FaissDB
+from rag.contracts.vector_store import VectorStoreContract
 from rag.entities.document import DocumentCollection, Document
-from rag.entities.vector_store import VectorStoreQueryParams
+from rag.entities.vector_store import VectorStoreQueryParams, VectorStoreBatchQueryParams
 from rag.utils.logger import logger
 
 class FAISSRetriever(RetrieverContract):
-    def __init__(self, client: FaissDB) -> None:
+    def __init__(self, client: VectorStoreContract, granularity: str|None = None) -> None:
         self.client = client
+        self.granularity = granularity
 
     def search(self, params: VectorStoreQueryParams) -> DocumentCollection:
+        if params.granularity is None and self.granularity is not None:
+            params = params.model_copy(update={'granularity': self.granularity})
         documents = DocumentCollection()
         for document in self.client.search(params):
             logger().debug(f"text: {document.page_content}")
-            documents.push(Document(text=document.page_content, metadata={}))
+            documents.push(Document(text=document.page_content, metadata=document.metadata))
         return documents
+
+    def search_batch(self, params: VectorStoreBatchQueryParams) -> list[DocumentCollection]:
+        if params.granularity is None and self.granularity is not None:
+            params = params.model_copy(update={'granularity': self.granularity})
+        collections = []
+        for result in self.client.search_batch(params):
+            documents = DocumentCollection()
+            for document in result:
+                documents.push(Document(text=document.page_content, metadata=document.metadata))
+            collections.append(documents)
+        return collections
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from rag.contracts.retriever import RetrieverContract
+from rag.entities.document import DocumentCollection
+from rag.entities.vector_store import VectorStoreQueryParams, VectorStoreBatchQueryParams
+
+# Константа reciprocal rank fusion, сглаживает вклад первых позиций
+RRF_K: int = 60
+
+class HybridRetriever(RetrieverContract):
+    """
+    Гибридный поиск: лексический и плотный поиск выполняются параллельно,
+    результаты объединяются reciprocal rank fusion: score = sum(1 / (rrf_k + rank)).
+    Каждый поиск возвращает max_results * overfetch кандидатов.
+    """
+    def __init__(
+            self,
+            lexical: RetrieverContract,
+            dense: RetrieverContract,
+            rrf_k: int = RRF_K,
+            overfetch: int = 2,
+    ) -> None:
+        self.lexical = lexical
+        self.dense = dense
+        self.rrf_k = rrf_k
+        self.overfetch = overfetch
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='hybrid-retriever')
+
+    def search(self, params: VectorStoreQueryParams) -> DocumentCollection:
+        candidates = params.model_copy(update={'max_results': params.max_results * self.overfetch})
+        lexical = self.executor.submit(self.lexical.search, candidates)
+        dense = self.executor.submit(self.dense.search, candidates)
+        return self._fuse([lexical.result(), dense.result()], params.max_results)
+
+    def search_batch(self, params: VectorStoreBatchQueryParams) -> list[DocumentCollection]:
+        candidates = params.model_copy(update={'max_results': params.max_results * self.overfetch})
+        lexical = self.executor.submit(self.lexical.search_batch, candidates)
+        dense = self.executor.submit(self.dense.search_batch, candidates)
+        return [
+            self._fuse([lexical_documents, dense_documents], params.max_results)
+            for lexical_documents, dense_documents in zip(lexical.result(), dense.result())
+        ]
+
+    def _fuse(self, collections: list[DocumentCollection], max_results: int) -> DocumentCollection:
+        scores = {}
+        documents = {}
+        for collection in collections:
+            for rank, document in enumerate(collection.all(), start=1):
+                scores[document.text] = scores.get(document.text, 0.0) + 1 / (self.rrf_k + rank)
+                documents.setdefault(document.text, document)
+
+        fused = DocumentCollection()
+        for text in sorted(scores, key=scores.get, reverse=True)[:max_results]:
+            fused.push(documents[text])
+        return fused
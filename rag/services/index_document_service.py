@@ -0,0 +1,49 @@
+from rag.entities.document import Document
+from rag.entities.index import IndexedDocument, IndexedChunk
+from rag.utils.hash import data_hash
+
+class IndexDocumentService:
+    @staticmethod
+    def document_id(document: Document) -> str:
+        """id из метаданных, иначе хеш текста вместе с метаданными: документы с одинаковым текстом не заменяют друг друга."""
+        document_id = document.metadata.get('id')
+        if document_id is None:
+            return data_hash({'text': document.text, 'metadata': document.metadata})
+        return str(document_id)
+
+    @classmethod
+    def make(
+            cls,
+            document: Document,
+            chunks: list[str],
+            parents: dict[str, list[str]]|None = None,
+            chunk_parents: list[dict[str, int]]|None = None,
+    ) -> IndexedDocument:
+        """
+        parents - тексты родительских фрагментов по гранулярностям,
+        chunk_parents - для каждого фрагмента номер его родителя в каждой гранулярности.
+        """
+        document_id = cls.document_id(document)
+        if not parents:
+            return IndexedDocument(
+                id=document_id,
+                hash=data_hash({'chunks': chunks, 'metadata': document.metadata}),
+                chunks=[
+                    IndexedChunk(id=f"{document_id}#{i}", text=chunk, metadata=document.metadata)
+                    for i, chunk in enumerate(chunks)
+                ],
+            )
+
+        return IndexedDocument(
+            id=document_id,
+            hash=data_hash({'chunks': chunks, 'parents': parents, 'metadata': document.metadata}),
+            chunks=[
+                IndexedChunk(
+                    id=f"{document_id}#{i}",
+                    text=chunk,
+                    metadata={**document.metadata, 'document_id': document_id, 'parents': chunk_parents[i]},
+                )
+                for i, chunk in enumerate(chunks)
+            ],
+            parents=parents,
+        )
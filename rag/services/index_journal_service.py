@@ -0,0 +1,94 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from rag.entities.index import IndexSyncResult
+
+STATUS_RUNNING: str = 'running'
+STATUS_DONE: str = 'done'
+
+class IndexJournalWriteError(Exception):
+    def __init__(self, path: Path, error: Exception):
+        super().__init__(f"Failed to write index journal {path}: {str(error)}")
+
+class IndexJournal:
+    """
+    Журнал задачи индексации: какие индексаторы завершены и сколько документов попало в последний чекпоинт.
+    Какие именно документы уже проиндексированы, хранит manifest каждой БД.
+    """
+    def __init__(self, path: Path, dataset: Path, data: dict = None) -> None:
+        self.path = path
+        self.dataset = dataset
+        self.data = data or {'dataset': str(dataset), 'fingerprint': self.fingerprint(dataset), 'indexers': {}}
+        self.resumed: dict[str, dict] = {}
+        self.skipped: list[str] = []
+
+    @classmethod
+    def open(cls, path: Path, dataset: Path, resume: bool = False) -> 'IndexJournal':
+        if resume and path.is_file():
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('fingerprint') == cls.fingerprint(dataset):
+                journal = cls(path, dataset, data)
+                journal.resumed = {
+                    name: state for name, state in data['indexers'].items() if state['status'] == STATUS_RUNNING
+                }
+                return journal
+
+        journal = cls(path, dataset)
+        journal.save()
+        return journal
+
+    @staticmethod
+    def fingerprint(dataset: Path) -> str:
+        stat = dataset.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def is_done(self, name: str) -> bool:
+        return self._state(name).get('status') == STATUS_DONE
+
+    def is_started(self, name: str) -> bool:
+        return self._state(name).get('status') is not None
+
+    def skip(self, name: str) -> None:
+        self.skipped.append(name)
+
+    def start(self, name: str) -> None:
+        self.data['indexers'].setdefault(name, {'documents': 0})
+        self.data['indexers'][name].update(status=STATUS_RUNNING, started_at=datetime.now().isoformat())
+        self.save()
+
+    def checkpoint(self, name: str, documents: int) -> None:
+        self.data['indexers'][name].update(documents=documents, checkpoint_at=datetime.now().isoformat())
+        self.save()
+
+    def finish(self, name: str, result: IndexSyncResult) -> None:
+        self.data['indexers'][name].update(
+            status=STATUS_DONE,
+            finished_at=datetime.now().isoformat(),
+            result=result.model_dump()
+        )
+        self.save()
+
+    def summary(self) -> dict:
+        """Сколько работы пропущено при возобновлении."""
+        return {
+            'skipped_indexers': len(self.skipped),
+            'resumed_indexers': len(self.resumed),
+            'skipped_documents': sum(
+                self._state(name).get('result', {}).get('unchanged', 0) for name in self.resumed
+            ),
+        }
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.data, file, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            raise IndexJournalWriteError(self.path, e)
+
+    def _state(self, name: str) -> dict:
+        return self.data['indexers'].get(name, {})
@@ -1,20 +1,78 @@
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 from rag.drivers.databases.faiss_db import FaissDB
+from rag.drivers.databases.faiss_db_pool import FaissDBPool
+from rag.drivers.databases.sharded_faiss_db import ShardedFaissDB, SHARD_DIR_PREFIX
+from rag.drivers.databases.snapshot_archive import SnapshotArchive, SnapshotStats, SNAPSHOT_SUFFIX
 from rag.drivers.embeddings.embedding import EmbeddingWrapper
+from rag.utils.logger import logger
+
+DATABASE_DIR: Path = Path("databases")
 
 class VectorDatabaseService:
-    def __init__(self, embedding: EmbeddingWrapper):
+    def __init__(
+            self,
+            embedding: EmbeddingWrapper|None,
+            pool: FaissDBPool|None = None,
+            snapshots: SnapshotArchive|None = None,
+    ):
+        """embedding не нужен для переноса БД через снимки."""
         self.embedding = embedding
+        self.pool = pool
+        self.snapshots = snapshots or SnapshotArchive()
 
-    def get_vector_databases(self) -> List[Tuple[str, FaissDB]]:
-        database_dir = Path("databases")
+    def get_vector_databases(self) -> List[Tuple[str, FaissDB|ShardedFaissDB]]:
+        database_dir = DATABASE_DIR
         vector_dbs = []
 
         for db_path in database_dir.iterdir():
-            if db_path.is_dir() and (db_path / "index.faiss").exists():
-                db_name = db_path.name
-                db = FaissDB(db_path=db_path, embeddings=self.embedding)
-                vector_dbs.append((db_name, db))
+            if not db_path.is_dir():
+                continue
+            db = FaissDB(db_path=db_path, embeddings=self.embedding, pool=self.pool)
+            if db.exists():
+                vector_dbs.append((db_path.name, db))
+            elif shards := ShardedFaissDB.shard_count(db_path):
+                db = ShardedFaissDB(db_path=db_path, embeddings=self.embedding, shards=shards, pool=self.pool)
+                vector_dbs.append((db_path.name, db))
+
+        return vector_dbs
+
+    def export_databases(self, target_dir: Path) -> dict[str, SnapshotStats]:
+        """Снимок каждой БД в target_dir/<имя БД>.snap, шарды - в target_dir/<имя БД>/shard_<i>.snap."""
+        results = {}
+        for name, db in self._file_databases():
+            results[name] = db.export_snapshot(target_dir / f"{name}{SNAPSHOT_SUFFIX}", self.snapshots)
+            logger().info(f"Exported DB {name}", **vars(results[name]))
+        return results
+
+    def import_databases(self, source_dir: Path) -> dict[str, SnapshotStats]:
+        """Шарды одной БД импортируются вместе и публикуются общей версией, см. ShardedFaissDB.import_snapshots."""
+        results = {}
+        sharded = {}
+        for archive in sorted(source_dir.rglob(f"*{SNAPSHOT_SUFFIX}")):
+            name = archive.relative_to(source_dir).with_suffix('')
+            if len(name.parts) > 1 and name.name.startswith(SHARD_DIR_PREFIX):
+                sharded.setdefault(name.parent.as_posix(), {})[int(name.name[len(SHARD_DIR_PREFIX):])] = archive
+                continue
+            db = FaissDB(db_path=DATABASE_DIR / name, embeddings=self.embedding, pool=self.pool)
+            results[name.as_posix()] = db.import_snapshot(archive, self.snapshots)
+            logger().info(f"Imported DB {name.as_posix()}", **vars(results[name.as_posix()]))
+
+        for name, archives in sharded.items():
+            db_path = DATABASE_DIR / name
+            shards = max(max(archives) + 1, ShardedFaissDB.shard_count(db_path) or 0)
+            db = ShardedFaissDB(db_path=db_path, embeddings=self.embedding, shards=shards, pool=self.pool)
+            for i, stats in db.import_snapshots(archives, self.snapshots).items():
+                results[f"{name}/{SHARD_DIR_PREFIX}{i}"] = stats
+                logger().info(f"Imported DB {name}/{SHARD_DIR_PREFIX}{i}", **vars(stats))
+        return results
 
-        return vector_dbs 
\ No newline at end of file
+    def _file_databases(self) -> Iterator[Tuple[str, FaissDB]]:
+        """БД, хранящие файлы: шардированная БД раскладывается на шарды."""
+        for name, db in self.get_vector_databases():
+            if isinstance(db, ShardedFaissDB):
+                for shard in db.shards:
+                    if shard.exists():
+                        yield f"{name}/{shard.db_path.name}", shard
+            else:
+                yield name, db
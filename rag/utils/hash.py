@@ -0,0 +1,12 @@
+import hashlib
+import json
+from typing import Any
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def data_hash(data: Any) -> str:
+    return text_hash(json.dumps(data, ensure_ascii=False, sort_keys=True, default=str))
@@ -0,0 +1,54 @@
+import sys
+import argparse
+import traceback
+from pathlib import Path
+from datetime import datetime
+from rag.bootstrap.bootstrap import container
+from rag.services.vector_database_service import VectorDatabaseService
+from rag.utils.logger import logger
+
+DEFAULT_SNAPSHOT_DIR = "snapshots"
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Vector database snapshots')
+    parser.add_argument(
+        'action',
+        type=str,
+        choices=['export', 'import'],
+        help='export - упаковать все БД из databases, import - распаковать снимки в databases'
+    )
+    parser.add_argument(
+        '--snapshot_dir',
+        type=str,
+        default=DEFAULT_SNAPSHOT_DIR,
+        help=f'Directory with snapshots (default: {DEFAULT_SNAPSHOT_DIR})'
+    )
+    return parser.parse_args()
+
+def main() -> None:
+    try:
+        args = parse_args()
+        snapshot_dir = Path(args.snapshot_dir)
+
+        # Файлы БД переносятся как есть, модель эмбеддингов не загружается
+        vector_db_service = VectorDatabaseService(embedding=None, snapshots=container.snapshot_archive())
+
+        start_time = datetime.now()
+        if args.action == 'export':
+            results = vector_db_service.export_databases(snapshot_dir)
+        else:
+            results = vector_db_service.import_databases(snapshot_dir)
+
+        logger().info(
+            f"Snapshot {args.action} completed",
+            databases=len(results),
+            raw_bytes=sum(stats.raw_bytes for stats in results.values()),
+            compressed_bytes=sum(stats.compressed_bytes for stats in results.values()),
+            duration_seconds=(datetime.now() - start_time).total_seconds(),
+        )
+    except Exception as e:
+        logger().error(f"Error: {str(e)}\n{traceback.format_exc()}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()